@@ -1,9 +1,28 @@
-from flask import Flask, render_template, request, redirect, url_for, session, send_from_directory, flash, jsonify, send_file
+from flask import Flask, Response, g, make_response, render_template, request, redirect, url_for, session, send_from_directory, flash, jsonify, send_file, stream_with_context
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin, SecureCookieSessionInterface
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
-from openpyxl import Workbook
+from contextlib import contextmanager
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
+from werkzeug.exceptions import NotFound
+from werkzeug.datastructures import CallbackDict
+from itsdangerous import URLSafeSerializer, BadSignature
+import click
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-import os, random, json, io, logging, traceback
+import os, re, sys, json, io, csv, zipfile, gzip, zlib, mimetypes, logging, traceback, threading, sqlite3, hashlib, queue, time, cProfile, secrets, unicodedata, ipaddress
+from urllib.parse import quote
+try:
+    import brotli
+except ImportError:   # optional: .br variants of static assets are skipped without it
+    brotli = None
+try:
+    import fcntl
+except ImportError:   # Windows: locked_file() falls back to msvcrt
+    fcntl = None
+    import msvcrt
 
 app = Flask(__name__)
 app.secret_key = "super-secret-localhost-key-2026"
@@ -17,16 +36,43 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, "data")
+DATA_DIR = os.path.abspath(os.environ.get("SPAS_DATA_DIR") or os.path.join(BASE_DIR, "data"))
 USERS_FILE = os.path.join(DATA_DIR, "users.json")
 FACULTY_FILE = os.path.join(DATA_DIR, "faculty.json")
 PRACTICALS_FILE = os.path.join(DATA_DIR, "practicals.json")
 QUESTIONS_FILE = os.path.join(DATA_DIR, "questions.json")
 SUBJECTS_FILE = os.path.join(DATA_DIR, "subjects.json")
 RESULTS_DIR = os.path.join(DATA_DIR, "results")
+RESULT_INDEX_FILE = os.path.join(DATA_DIR, "result_index.ndjson")
+SQLITE_FILE = os.path.join(DATA_DIR, "spas.sqlite3")
+DATA_VERSION_FILE = os.path.join(DATA_DIR, "data_version")
+QUESTION_ID_FILE = os.path.join(DATA_DIR, "question_ids")
+EXPORT_CACHE_DIR = os.path.join(DATA_DIR, "export_cache")
+SUBMISSION_JOURNAL_DIR = os.path.join(DATA_DIR, "journal")
+
+# "json" keeps the flat files; "sqlite" serves the same helpers from SQLITE_FILE
+# (populate it once with `flask migrate-sqlite`).
+STORAGE_BACKEND = os.environ.get("SPAS_STORAGE", "json").lower()
 
 EXAM_DURATION_SECONDS = 30 * 60
 
+# Faculty result modals, addressed by result filename. What is served for a
+# filename stays the same, but the record file behind it does not: a legacy .txt
+# report is rewritten as a JSON record the first time it is opened, and a queued
+# submission is served from memory until the writer stores it. Students cannot
+# resubmit, so the result a URL points at only changes on account deletion; a
+# short max-age with revalidation bounds how long a deleted result stays cached.
+RESULT_CACHE_CONTROL = "private, max-age=60, must-revalidate"
+
+# Columns accepted by /export_scores; "scores" expands to one column per practical.
+EXPORT_COLUMNS = ("roll_no", "name", "branch", "year", "batch", "scores", "total", "average")
+
+# Generated exports are kept on disk, least recently used evicted beyond this size.
+app.config.setdefault("EXPORT_CACHE_MAX_BYTES", 50 * 1024 * 1024)
+# Journal submissions and write them out from a background thread (see Submission Queue).
+app.config.setdefault("SUBMISSION_QUEUE", True)
+app.config.setdefault("SUBMISSION_BATCH_SIZE", 50)
+
 # ─────────────────────────── Global Error Handlers ────────────────────────────
 
 @app.errorhandler(404)
@@ -65,7 +111,9 @@ def read_file_safe(filepath):
     for enc in ("utf-8", "latin-1", "cp1252"):
         try:
             with open(filepath, "r", encoding=enc) as f:
-                return f.read()
+                content = f.read()
+                _io_note("bytes_read", os.fstat(f.fileno()).st_size)   # tell() on a text file is not a byte count
+                return content
         except UnicodeDecodeError:
             continue
         except Exception as e:
@@ -73,32 +121,359 @@ def read_file_safe(filepath):
             return None
     return None
 
-def load_json(path):
-    if not os.path.exists(path):
-        if "users" in path or "faculty" in path:
-            return {}
-        return []
+class _FrozenDict(dict):
+    """Read-only dict handed out by the JSON cache. Use load_json(path) for a mutable copy."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("cached JSON data is read-only; call load_json(path) for a mutable copy")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+
+def _freeze(obj):
+    if isinstance(obj, dict):
+        return _FrozenDict((k, _freeze(v)) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return tuple(_freeze(v) for v in obj)
+    return obj
+
+
+def _thaw(obj):
+    if isinstance(obj, dict):
+        return {k: _thaw(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_thaw(v) for v in obj]
+    return obj
+
+
+# path -> ((mtime_ns, size), frozen data). Shared by all requests in this process.
+_json_cache = {}
+_json_cache_lock = threading.Lock()
+_json_cache_stats = {"hits": 0, "misses": 0}
+
+
+def json_cache_stats():
+    """Return hit/miss counters and entry count of the load_json cache."""
+    with _json_cache_lock:
+        return dict(_json_cache_stats, entries=len(_json_cache))
+
+
+def _json_default(path):
+    return {} if ("users" in path or "faculty" in path) else []
+
+
+def _json_source_key(path):
+    """What the cached copy of path is validated against: (mtime_ns, size), or the sqlite generation."""
+    table = _sqlite_table(path)
+    if table:
+        return ("sqlite", _sqlite_generation(table))
     try:
-        content = read_file_safe(path)
-        if not content or not content.strip():
-            return {} if ("users" in path or "faculty" in path) else []
-        return json.loads(content)
-    except Exception as e:
-        logger.error("Could not parse %s: %s", path, e)
-        return {} if ("users" in path or "faculty" in path) else []
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def load_json(path, readonly=False):
+    """Load a JSON data file through the process-wide cache.
+
+    Entries are revalidated against the file's mtime and size on every call, so
+    writes made by other workers are picked up. With readonly=True the shared
+    cached object is returned (dicts refuse mutation, lists become tuples);
+    otherwise the caller gets a private mutable copy it may edit and save_json().
+    With the sqlite backend the data files are served from their tables and the
+    cache is revalidated against a per-document generation counter instead.
+    """
+    table = _sqlite_table(path)
+    key = _json_source_key(path)
+    if key is None:
+        return _json_default(path)
+
+    with _json_cache_lock:
+        cached = _json_cache.get(path)
+        if cached and cached[0] == key:
+            _json_cache_stats["hits"] += 1
+            frozen = cached[1]
+        else:
+            _json_cache_stats["misses"] += 1
+            frozen = None
 
-def save_json(path, data):
+    if frozen is None:
+        try:
+            if table:
+                frozen = _freeze(_sqlite_read_doc(table))
+            else:
+                content = read_file_safe(path)
+                if not content or not content.strip():
+                    return _json_default(path)
+                frozen = _freeze(json.loads(content))
+                _io_note("json_loads")
+        except Exception as e:
+            logger.error("Could not parse %s: %s", path, e)
+            return _json_default(path)
+        with _json_cache_lock:
+            _json_cache[path] = (key, frozen)
+
+    return frozen if readonly else _thaw(frozen)
+
+def save_json(path, data, removed=()):
+    """Write `data` to `path`. `removed` names the keys of a mapping the caller deleted.
+
+    On the sqlite backend users and faculty are written row by row, and only
+    the keys in `removed` are deleted, so a row added by another worker since
+    `data` was loaded survives.
+    """
+    table = _sqlite_table(path)
+    if table:
+        try:
+            source = _json_source_key(path)
+            previous = load_json(path, readonly=True)
+            generation = _sqlite_write_doc(table, data, previous, removed)
+            if isinstance(data, dict):
+                # rows of `previous` that the caller neither kept nor removed are still stored
+                stored = dict(previous)
+                stored.update(data)
+                for key in removed:
+                    stored.pop(key, None)
+            else:
+                stored = data
+            with _json_cache_lock:
+                if generation == source[1] + 1:
+                    _json_cache[path] = (("sqlite", generation), _freeze(stored))
+                else:   # another worker wrote in between; reload on next use
+                    _json_cache.pop(path, None)
+            return True
+        except Exception as e:
+            logger.error("Could not save %s to sqlite: %s", path, e)
+            return False
     try:
         dir_path = os.path.dirname(path)
         if dir_path:
             os.makedirs(dir_path, exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
+        # Write a sibling temp file and rename it over the original so readers
+        # (and other workers) see either the old or the new file, never half of one.
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        _io_note("json_dumps")
+        # Seed the cache with what we just wrote so the next load skips the parse.
+        st = os.stat(path)
+        with _json_cache_lock:
+            _json_cache[path] = ((st.st_mtime_ns, st.st_size), _freeze(data))
         return True
     except Exception as e:
         logger.error("Could not save %s: %s", path, e)
         return False
 
+@contextmanager
+def locked_file(path, shared=False):
+    """Hold an exclusive lock, shared by every worker, around a read-modify-write of `path`.
+
+    The lock is taken on a sibling `.lock` file so it survives save_json
+    replacing `path` itself. shared=True takes a shared lock instead, for
+    writers that only append (exclusive on Windows, which has no shared locks).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".lock", "a+b") as lock:
+        if fcntl:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+            else:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _try_lock(f):
+    """Take an exclusive lock on open file `f` without blocking; False if another holder has it.
+
+    The lock lasts until `f` is closed or its process dies, which is how a
+    worker marks a file as its own for its whole lifetime.
+    """
+    try:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            os.lseek(f.fileno(), 0, os.SEEK_SET)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+# ─────────────────────────── SQLite Storage ───────────────────────────────────
+#
+# Optional backend selected with SPAS_STORAGE=sqlite. Each JSON data file maps to
+# a table holding one JSON document per row; users/faculty are saved by diffing
+# against the cached copy so a registration writes one row instead of the whole
+# file; rows are only deleted when save_json is told which keys were removed. Result summaries live in the `results` table and replace the NDJSON
+# index. Connections are per thread and opened lazily after gunicorn forks.
+
+# file name -> (table, key column for mapping documents or None for lists, indexed columns)
+_SQLITE_DOCS = {
+    "users.json":      ("students",   "roll_no",    ("batch",)),
+    "faculty.json":    ("faculty",    "faculty_id", ()),
+    "practicals.json": ("practicals", None,         ("name",)),
+    "subjects.json":   ("subjects",   None,         ("id", "name")),
+    "questions.json":  ("questions",  None,         ("id", "practical")),
+}
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, generation INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS students (roll_no TEXT PRIMARY KEY, batch TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_students_batch ON students (batch);
+CREATE TABLE IF NOT EXISTS faculty (faculty_id TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS practicals (position INTEGER PRIMARY KEY, name TEXT, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS subjects (position INTEGER PRIMARY KEY, id TEXT, name TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_subjects_name ON subjects (name);
+CREATE TABLE IF NOT EXISTS questions (position INTEGER PRIMARY KEY, id INTEGER, practical TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_questions_practical ON questions (practical);
+CREATE TABLE IF NOT EXISTS results (
+    filename TEXT PRIMARY KEY, roll_no TEXT NOT NULL, practical TEXT NOT NULL, ts INTEGER NOT NULL,
+    points INTEGER, score TEXT, attempted TEXT, correct TEXT, wrong TEXT, batch TEXT, datetime TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_results_roll_practical ON results (roll_no, practical, ts);
+CREATE INDEX IF NOT EXISTS idx_results_practical ON results (practical);
+CREATE INDEX IF NOT EXISTS idx_results_batch ON results (batch);
+"""
+
+_RESULT_COLUMNS = ("filename", "roll_no", "practical", "ts", "score",
+                   "attempted", "correct", "wrong", "batch", "datetime")
+
+_sqlite_local = threading.local()
+
+def _sqlite_table(path):
+    """Table backing a data file, or None when the file is not served from sqlite."""
+    if STORAGE_BACKEND != "sqlite" or os.path.dirname(path) != DATA_DIR:
+        return None
+    spec = _SQLITE_DOCS.get(os.path.basename(path))
+    return spec[0] if spec else None
+
+def _sqlite_spec(table):
+    return next(spec for spec in _SQLITE_DOCS.values() if spec[0] == table)
+
+def _db():
+    conn = getattr(_sqlite_local, "conn", None)
+    if conn is None or _sqlite_local.pid != os.getpid():
+        os.makedirs(os.path.dirname(SQLITE_FILE), exist_ok=True)
+        conn = sqlite3.connect(SQLITE_FILE, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SQLITE_SCHEMA)
+        _sqlite_local.conn, _sqlite_local.pid = conn, os.getpid()
+    return conn
+
+@contextmanager
+def _db_transaction():
+    """`with _db_transaction() as conn:` runs the block in one IMMEDIATE transaction."""
+    conn = _db()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+def _sqlite_generation(table):
+    row = _db().execute("SELECT generation FROM meta WHERE name = ?", (table,)).fetchone()
+    return row[0] if row else 0
+
+def _sqlite_read_doc(table):
+    key_col = _sqlite_spec(table)[1]
+    if key_col:
+        rows = _db().execute(f"SELECT {key_col}, data FROM {table} ORDER BY rowid")
+        doc = {key: json.loads(data) for key, data in rows}
+    else:
+        rows = _db().execute(f"SELECT data FROM {table} ORDER BY position")
+        doc = [json.loads(data) for (data,) in rows]
+    _io_note("json_loads", len(doc))
+    return doc
+
+def _sqlite_row(table, item, key=None):
+    _, key_col, columns = _sqlite_spec(table)
+    values = [item.get(c) if isinstance(item, dict) else item for c in columns]
+    if key_col:
+        values.insert(0, key)
+    return values + [json.dumps(item, ensure_ascii=False)]
+
+def _sqlite_write_doc(table, data, previous, removed=(), replace=False):
+    """Persist a whole document, touching only changed rows of mapping tables. Returns the new generation.
+
+    Mapping rows are deleted only when their key is in `removed`, or, with
+    replace=True, when it is missing from `data`.
+    """
+    _, key_col, columns = _sqlite_spec(table)
+    with _db_transaction() as conn:
+        if key_col:
+            cols = (key_col,) + columns + ("data",)
+            changed = [_sqlite_row(table, item, key) for key, item in data.items()
+                       if previous.get(key) != item]
+            updates = ", ".join(f"{c} = excluded.{c}" for c in cols[1:])
+            conn.executemany(
+                f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+                f"ON CONFLICT ({key_col}) DO UPDATE SET {updates}", changed)
+            if replace:
+                removed = [key for (key,) in conn.execute(f"SELECT {key_col} FROM {table}") if key not in data]
+            conn.executemany(f"DELETE FROM {table} WHERE {key_col} = ?", [(key,) for key in removed])
+        else:
+            cols = ("position",) + columns + ("data",)
+            conn.execute(f"DELETE FROM {table}")
+            conn.executemany(
+                f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                [[pos] + _sqlite_row(table, item) for pos, item in enumerate(data)])
+        return _sqlite_bump_generation(conn, table)
+
+def _sqlite_bump_generation(conn, name):
+    conn.execute("INSERT INTO meta (name, generation) VALUES (?, 1) "
+                 "ON CONFLICT (name) DO UPDATE SET generation = generation + 1", (name,))
+    return conn.execute("SELECT generation FROM meta WHERE name = ?", (name,)).fetchone()[0]
+
+def _score_points(score):
+    """'17 / 20' -> 17; None when the score cannot be parsed."""
+    try:
+        return int(str(score).split('/')[0].strip())
+    except (ValueError, TypeError):
+        return None
+
+def _sqlite_insert_results(conn, entries):
+    conn.executemany(
+        f"INSERT OR REPLACE INTO results ({', '.join(_RESULT_COLUMNS)}, points) "
+        f"VALUES ({', '.join('?' * len(_RESULT_COLUMNS))}, ?)",
+        [[e[c] for c in _RESULT_COLUMNS] + [_score_points(e["score"])] for e in entries])
+
+def _sqlite_latest_results(where="", params=(), join=""):
+    rows = _db().execute(
+        f"SELECT {', '.join('r.' + c for c in _RESULT_COLUMNS)} FROM results r "
+        f"JOIN (SELECT roll_no, practical, MAX(ts) AS ts FROM results GROUP BY roll_no, practical) m "
+        f"ON m.roll_no = r.roll_no AND m.practical = r.practical AND m.ts = r.ts {join} {where}", params)
+    return [dict(zip(_RESULT_COLUMNS, row)) for row in rows]
+
+def migrate_to_sqlite():
+    """Import the JSON data files and every parseable result file into SQLITE_FILE. Returns row counts."""
+    counts = {}
+    for name, (table, key_col, _) in _SQLITE_DOCS.items():
+        path = os.path.join(DATA_DIR, name)
+        content = read_file_safe(path) if os.path.exists(path) else None
+        data = json.loads(content) if content and content.strip() else ({} if key_col else [])
+        _sqlite_write_doc(table, data, {}, replace=True)
+        counts[table] = len(data)
+    with _db_transaction() as conn:
+        entries = _scan_result_files()
+        conn.execute("DELETE FROM results")
+        _sqlite_insert_results(conn, entries)
+        _sqlite_bump_generation(conn, "results")
+    counts["results"] = len(entries)
+    return counts
+
 def is_student():
     return "roll_no" in session
 
@@ -108,51 +483,696 @@ def is_faculty():
 def is_logged_in():
     return is_student() or is_faculty()
 
-def delete_user_results(roll_no):
-    """Delete all result files for a specific user."""
+def _conditional_response(etag_source, cache_control, build):
+    """Serve build() tagged with a strong ETag, or an empty 304 if the client already has that version.
+
+    etag_source must identify the payload without loading it (a filename, a
+    file's mtime), so that a matching If-None-Match costs no file reads. Only a
+    2xx from build() is tagged and made cacheable; errors go out as built.
+    """
+    etag = hashlib.sha1(repr(etag_source).encode("utf-8")).hexdigest()[:20]
+    if request.if_none_match.contains_weak(etag):   # weak comparison, as RFC 9110 specifies for If-None-Match
+        response = Response(status=304)
+    else:
+        response = make_response(build())
+        if not 200 <= response.status_code < 300:
+            return response
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+# ─────────────────────────── Result Index ─────────────────────────────────────
+#
+# Append-only NDJSON log of result summaries, replayed into memory. Every process
+# tails the log (stat + read of the new bytes) before answering a query, so
+# submissions made by other gunicorn workers show up without rescanning
+# RESULTS_DIR. Records are {"op": "put", ...entry} or {"op": "drop", "roll_no"}.
+# The log is rebuilt from the result files when it is missing, or on demand with
+# `flask rebuild-index`; a rebuild holds the log's lock exclusively and appends
+# hold it shared, so none is lost to the rebuild's replace.
+
+_result_index = {"latest": {}, "files": {}, "offset": 0, "ino": None}
+_result_index_lock = threading.Lock()
+
+def _result_ts(filename):
+    try:
+        return int(os.path.splitext(filename)[0].rsplit('_', 1)[-1])
+    except Exception:
+        return 0
+
+def _parse_result_header(content):
+    """Return the 'Key: value' summary lines above the question section."""
+    header = {}
+    for line in content.split('\n'):
+        if '==========' in line:
+            break
+        if ':' in line:
+            key, value = line.split(':', 1)
+            key = key.strip()
+            if key and key not in ('----------',):
+                header[key] = value.strip()
+    return header
+
+def _index_entry(filename, record):
+    return {
+        "roll_no":   str(record.get("roll_no", "")).strip(),
+        "practical": str(record.get("practical_name", "")).strip(),
+        "filename":  filename,
+        "ts":        _result_ts(filename),
+        "score":     record.get("score", ""),
+        "attempted": str(record.get("attempted", "")),
+        "correct":   str(record.get("correct", "")),
+        "wrong":     str(record.get("wrong", "")),
+        "batch":     record.get("batch", "1"),
+        "datetime":  record.get("datetime", ""),
+    }
+
+def _entry_as_header(entry):
+    """Present an index entry with the same keys as a parsed result header."""
+    return {
+        "Roll No":     entry["roll_no"],
+        "Batch":       entry["batch"],
+        "Practical":   entry["practical"],
+        "Score":       entry["score"],
+        "Attempted":   entry["attempted"],
+        "Correct":     entry["correct"],
+        "Wrong":       entry["wrong"],
+        "Date & Time": entry["datetime"],
+    }
+
+def _apply_index_record(rec):
+    latest, files = _result_index["latest"], _result_index["files"]
+    roll_no = rec.get("roll_no", "")
+    if rec.get("op") == "drop":
+        latest.pop(roll_no, None)
+        files.pop(roll_no, None)
+        _matrix_drop_roll(roll_no)
+        return
+    entry = {k: v for k, v in rec.items() if k != "op"}
+    files.setdefault(roll_no, {})[entry["filename"]] = entry
+    per_roll = latest.setdefault(roll_no, {})
+    current = per_roll.get(entry["practical"])
+    if current is None or entry["ts"] >= current["ts"]:
+        per_roll[entry["practical"]] = entry
+    _matrix_put(entry)
+
+def _scan_result_files():
+    """Read every result record (or legacy report header) on disk. Returns a list of index entries."""
+    entries = []
     if not os.path.exists(RESULTS_DIR):
+        return entries
+    names = set(os.listdir(RESULTS_DIR))
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        filename = stem + ".txt"
+        if ext == ".json":
+            record = _read_result_record(os.path.join(RESULTS_DIR, name))
+        elif ext == ".txt" and stem + ".json" not in names:
+            content = read_file_safe(os.path.join(RESULTS_DIR, name))
+            record = _header_as_record(_parse_result_header(content)) if content else None
+        else:
+            continue
+        if not record:
+            continue
+        entry = _index_entry(filename, record)
+        if entry["roll_no"] and entry["practical"]:
+            entries.append(entry)
+    return entries
+
+def _write_result_index_log(if_missing=False):
+    """Rewrite the log from the result files. Returns the entry count, or None if if_missing and it exists.
+
+    Runs under the log's exclusive lock while appenders take it shared, so no
+    append lands in the old file between the scan and the replace; with
+    if_missing, workers that find the log gone wait for the first one to
+    rebuild it instead of all scanning at once.
+    """
+    with locked_file(RESULT_INDEX_FILE):
+        if if_missing and os.path.exists(RESULT_INDEX_FILE):
+            return None
+        entries = _scan_result_files()
+        tmp_path = f"{RESULT_INDEX_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(dict(entry, op="put"), ensure_ascii=False) + "\n")
+        os.replace(tmp_path, RESULT_INDEX_FILE)
+    return len(entries)
+
+def rebuild_result_index():
+    """Rewrite the index log from the result files and reload it. Returns the entry count."""
+    bump_data_version()
+    if STORAGE_BACKEND == "sqlite":
+        with _db_transaction() as conn:   # scanned inside the write lock so no insert slips in between
+            entries = _scan_result_files()
+            conn.execute("DELETE FROM results")
+            _sqlite_insert_results(conn, entries)
+            _sqlite_bump_generation(conn, "results")
+        return len(entries)
+    count = _write_result_index_log()
+    with _result_index_lock:
+        _refresh_result_index()
+    return count
+
+def _refresh_result_index():
+    """Apply log records written since the last refresh. Caller holds _result_index_lock."""
+    if not os.path.exists(RESULT_INDEX_FILE):
+        _write_result_index_log(if_missing=True)
+    st = os.stat(RESULT_INDEX_FILE)
+    if st.st_ino != _result_index["ino"] or st.st_size < _result_index["offset"]:
+        _result_index.update(latest={}, files={}, offset=0, ino=st.st_ino)
+        _matrix_reset()
+    if st.st_size == _result_index["offset"]:
+        return
+    with open(RESULT_INDEX_FILE, "rb") as f:
+        f.seek(_result_index["offset"])
+        chunk = f.read(st.st_size - _result_index["offset"])
+    _io_note("bytes_read", len(chunk))
+    complete = chunk.rfind(b"\n") + 1   # leave a partially written last line for next time
+    for line in chunk[:complete].splitlines():
+        if line.strip():
+            try:
+                _apply_index_record(json.loads(line))
+                _io_note("json_loads")
+            except Exception as e:
+                logger.error("Skipping bad result index record %r: %s", line[:200], e)
+    _result_index["offset"] += complete
+
+def _append_index_records(records):
+    data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+    with locked_file(RESULT_INDEX_FILE, shared=True):   # a rebuild holds it exclusively
+        fd = os.open(RESULT_INDEX_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)   # one O_APPEND write so concurrent workers never interleave
+        finally:
+            os.close(fd)
+
+def index_results(items):
+    """Record newly written results, given as (filename, record) pairs, in the index."""
+    entries = [_index_entry(filename, record) for filename, record in items]
+    if STORAGE_BACKEND == "sqlite":
+        with _db_transaction() as conn:
+            _sqlite_insert_results(conn, entries)
         return
-    for filename in os.listdir(RESULTS_DIR):
-        if filename.startswith(f"Result_RollNo_{roll_no}_") and filename.endswith('.txt'):
-            filepath = os.path.join(RESULTS_DIR, filename)
+    _append_index_records([dict(entry, op="put") for entry in entries])
+
+def _indexed_results(roll_no):
+    """Latest index entry per practical for one student: {practical: entry}.
+
+    Submissions still waiting in any worker's write queue are included.
+    """
+    if STORAGE_BACKEND == "sqlite":
+        latest = {e["practical"]: e for e in _sqlite_latest_results("WHERE r.roll_no = ?", (roll_no,))}
+    else:
+        with _result_index_lock:
+            _refresh_result_index()
+            latest = dict(_result_index["latest"].get(roll_no, {}))
+    for filename, record in _pending_submissions(roll_no):
+        entry = _index_entry(filename, record)
+        current = latest.get(entry["practical"])
+        if current is None or entry["ts"] >= current["ts"]:
+            latest[entry["practical"]] = entry
+    return latest
+
+def _all_indexed_results():
+    """Latest index entry for every (roll_no, practical) pair."""
+    if STORAGE_BACKEND == "sqlite":
+        return _sqlite_latest_results()
+    with _result_index_lock:
+        _refresh_result_index()
+        return [e for per_roll in _result_index["latest"].values() for e in per_roll.values()]
+
+def delete_user_results(roll_no):
+    """Delete all result files for a specific user, including submissions still queued in this worker."""
+    with _submission_lock:
+        pending = _submission_state["pending"]
+        for filename in [f for f, r in list(pending.items()) if r.get("roll_no") == roll_no]:
+            pending.pop(filename, None)
+    if STORAGE_BACKEND == "sqlite":
+        with _db_transaction() as conn:
+            filenames = [f for (f,) in conn.execute("SELECT filename FROM results WHERE roll_no = ?", (roll_no,))]
+            conn.execute("DELETE FROM results WHERE roll_no = ?", (roll_no,))
+            drops = _sqlite_bump_generation(conn, "results")
+        with _result_index_lock:
+            if _score_matrix["drops"] == drops - 1:   # nothing else changed: patch instead of reloading
+                _matrix_drop_roll(roll_no)
+                _score_matrix["drops"] = drops
+    else:
+        with _result_index_lock:
+            _refresh_result_index()
+            filenames = list(_result_index["files"].get(roll_no, ()))
+    for filename in filenames:
+        for filepath in (os.path.join(RESULTS_DIR, filename), _result_record_path(filename)):
             try:
                 os.remove(filepath)
+            except FileNotFoundError:
+                pass
             except Exception as e:
                 logger.error("Could not delete %s: %s", filepath, e)
+    if STORAGE_BACKEND != "sqlite":
+        _append_index_records([{"op": "drop", "roll_no": roll_no}])
 
 def get_student_results(roll_no):
-    results = []
-    if not os.path.exists(RESULTS_DIR):
-        return results
-    for filename in os.listdir(RESULTS_DIR):
-        if not (filename.startswith(f"Result_RollNo_{roll_no}_") and filename.endswith('.txt')):
+    """Summary headers of every result of one student, oldest first, retakes included."""
+    if STORAGE_BACKEND == "sqlite":
+        rows = _db().execute(f"SELECT {', '.join(_RESULT_COLUMNS)} FROM results WHERE roll_no = ?", (roll_no,))
+        entries = {row[0]: dict(zip(_RESULT_COLUMNS, row)) for row in rows}
+    else:
+        with _result_index_lock:
+            _refresh_result_index()
+            entries = dict(_result_index["files"].get(roll_no, {}))
+    for filename, record in _pending_submissions(roll_no):
+        entries[filename] = _index_entry(filename, record)
+    return [_entry_as_header(e) for e in sorted(entries.values(), key=lambda e: e["ts"])]
+
+# ─────────────────────────── Score Matrix ─────────────────────────────────────
+#
+# Materialized student x practical score table used by the faculty views. It is
+# fed from the result index: in JSON mode every replayed log record is applied to
+# it, in SQLite mode rows past the last seen rowid are pulled in. Per-student
+# totals cover the practicals currently listed in practicals.json and are
+# adjusted column by column when that list changes. Guarded by _result_index_lock.
+
+_score_matrix = {
+    "scores": {},          # roll_no -> {practical: (ts, points)}
+    "submitters": {},      # practical -> set(roll_no)
+    "totals": {},          # roll_no -> [total, count] over listed practicals
+    "practicals": frozenset(),
+    "practicals_src": None,
+    "rowid": 0,
+    "drops": None,
+}
+
+def _matrix_reset():
+    _score_matrix.update(scores={}, submitters={}, totals={}, practicals=frozenset(),
+                         practicals_src=None, rowid=0, drops=None)
+
+def _matrix_count(roll_no, points, sign):
+    totals = _score_matrix["totals"].setdefault(roll_no, [0, 0])
+    totals[0] += sign * points
+    totals[1] += sign
+    if not totals[1]:
+        del _score_matrix["totals"][roll_no]
+
+def _matrix_put(entry):
+    if '/' not in entry["score"]:
+        return
+    roll_no, practical = entry["roll_no"], entry["practical"]
+    row = _score_matrix["scores"].setdefault(roll_no, {})
+    current = row.get(practical)
+    if current is not None and current[0] > entry["ts"]:
+        return
+    listed = practical in _score_matrix["practicals"]
+    if current is not None and listed:
+        _matrix_count(roll_no, current[1], -1)
+    points = _score_points(entry["score"]) or 0
+    row[practical] = (entry["ts"], points)
+    _score_matrix["submitters"].setdefault(practical, set()).add(roll_no)
+    if listed:
+        _matrix_count(roll_no, points, 1)
+
+def _matrix_drop_roll(roll_no):
+    for practical in _score_matrix["scores"].pop(roll_no, {}):
+        _score_matrix["submitters"].get(practical, set()).discard(roll_no)
+    _score_matrix["totals"].pop(roll_no, None)
+
+def _matrix_sync_practicals():
+    """Move per-student totals in line with the current practicals.json list."""
+    source = load_json(PRACTICALS_FILE, readonly=True)
+    if source is _score_matrix["practicals_src"]:
+        return
+    listed = frozenset(p.strip() for p in source)
+    previous = _score_matrix["practicals"]
+    scores = _score_matrix["scores"]
+    for practical, sign in [(p, -1) for p in previous - listed] + [(p, 1) for p in listed - previous]:
+        for roll_no in _score_matrix["submitters"].get(practical, ()):
+            _matrix_count(roll_no, scores[roll_no][practical][1], sign)
+    _score_matrix.update(practicals=listed, practicals_src=source)
+
+def _refresh_score_matrix():
+    """Bring the matrix up to date with the index. Caller holds _result_index_lock."""
+    if STORAGE_BACKEND == "sqlite":
+        drops = _sqlite_generation("results")
+        if drops != _score_matrix["drops"]:
+            _matrix_reset()
+            _score_matrix["drops"] = drops
+        rows = _db().execute(
+            f"SELECT rowid, {', '.join(_RESULT_COLUMNS)} FROM results WHERE rowid > ? ORDER BY rowid",
+            (_score_matrix["rowid"],)).fetchall()
+        for row in rows:
+            _matrix_put(dict(zip(_RESULT_COLUMNS, row[1:])))
+        if rows:
+            _score_matrix["rowid"] = rows[-1][0]
+    else:
+        _refresh_result_index()
+    _matrix_sync_practicals()
+
+def _student_performance(roll_no, student, practicals, all_listed):
+    """One row of the score table. Caller holds _result_index_lock with the matrix refreshed."""
+    row = _score_matrix["scores"].get(roll_no, {})
+    practical_scores = {p: row[p.strip()][1] for p in practicals if p.strip() in row}
+    if all_listed:
+        total, count = _score_matrix["totals"].get(roll_no, (0, 0))
+    else:
+        total, count = sum(practical_scores.values()), len(practical_scores)
+    return {
+        "name": student.get("full_name", ""),
+        "branch": student.get("branch", ""),
+        "year": student.get("year", ""),
+        "batch": student.get("batch", "1"),
+        "email": student.get("email", ""),
+        "practical_scores": practical_scores,
+        "total": total,
+        "average": round(total / count, 2) if count > 0 else 0,
+        "exams_taken": count
+    }
+
+def iter_student_performance(students, practicals, chunk_size=500):
+    """Yield (roll_no, performance) for each student, taking the matrix lock one chunk at a time."""
+    items = list(students.items())
+    stripped = {p.strip() for p in practicals}
+    for start in range(0, len(items), chunk_size):
+        with _result_index_lock:
+            _refresh_score_matrix()
+            all_listed = stripped == _score_matrix["practicals"]
+            rows = [(roll_no, _student_performance(roll_no, student, practicals, all_listed))
+                    for roll_no, student in items[start:start + chunk_size]]
+        yield from rows
+
+def _roll_sort_key(roll_no):
+    return (0, int(roll_no), roll_no) if roll_no.isdigit() else (1, 0, roll_no)
+
+def performance_page(students, practicals, sort="roll_no", descending=False, offset=0, limit=50, submitted=None):
+    """One page of the score table sorted server-side. Returns (matching student count, [(roll_no, performance)]).
+
+    sort is roll_no, name, total, average or "practical:<name>" with the name as
+    listed in `practicals`. With submitted set, only students who submitted that
+    practical are included. Sorting by roll number or name only computes the
+    performance rows of the requested page.
+    """
+    if submitted is not None:
+        with _result_index_lock:
+            _refresh_score_matrix()
+            rolls = set(_score_matrix["submitters"].get(submitted.strip(), ()))
+        students = {r: s for r, s in students.items() if r in rolls}
+
+    if sort in ("roll_no", "name"):
+        if sort == "roll_no":
+            key = lambda item: _roll_sort_key(item[0])
+        else:
+            key = lambda item: (item[1].get("full_name", "").casefold(), _roll_sort_key(item[0]))
+        ordered = sorted(students.items(), key=key, reverse=descending)
+        page = dict(ordered[offset:offset + limit])
+        return len(ordered), list(iter_student_performance(page, practicals))
+
+    rows = list(iter_student_performance(students, practicals))
+    if sort.startswith("practical:"):
+        practical = sort.split(":", 1)[1]
+        rows.sort(key=lambda row: (row[1]["practical_scores"].get(practical, -1), _roll_sort_key(row[0])),
+                  reverse=descending)
+    else:
+        rows.sort(key=lambda row: (row[1][sort], _roll_sort_key(row[0])), reverse=descending)
+    return len(rows), rows[offset:offset + limit]
+
+def practical_submission_counts(students, practicals):
+    """{practical: number of `students` who submitted it}, practical names as listed."""
+    with _result_index_lock:
+        _refresh_score_matrix()
+        submitters = _score_matrix["submitters"]
+        return {p: len(students.keys() & submitters.get(p.strip(), set())) for p in practicals}
+
+# ─────────────────────────── Question Bank ────────────────────────────────────
+#
+# questions.json indexed by id and by practical. The bank is rebuilt whenever
+# load_json hands back a different cached object for the file, i.e. after
+# add_question/delete_question (or another worker) write it, and is swapped in
+# as a whole so readers never see a half-built index.
+#
+# An exam paper is not stored: it is derived from (practical, roll_no, seed)
+# and the bank snapshot taken at exam start, the highest question id handed out
+# by then. Ids come from a counter that never goes backwards (see
+# allocate_question_ids), so questions added later always have higher ids and
+# never change a running paper. Questions of the practical with an id up to the
+# snapshot are ranked by a keyed hash and the first PAPER_SIZE are taken, each
+# with its options in a hashed order, so /exam and submit_exam regenerate the
+# same paper from the session's seed.
+#
+# Deleted questions are not pinned: deleting a question drops it from every
+# paper regenerated afterwards, including exams in progress. If the practical
+# has more than PAPER_SIZE questions the next-ranked one takes its place,
+# otherwise the paper is one question shorter; answers are graded by question
+# id, so the remaining answers still count.
+
+_question_bank = {"source": None, "by_id": {}, "by_practical": {}, "counts": {}, "next_id": 1}
+_question_bank_lock = threading.Lock()
+
+def question_bank():
+    """Return the current question bank: by_id, by_practical, counts and next_id."""
+    global _question_bank
+    source = load_json(QUESTIONS_FILE, readonly=True)
+    bank = _question_bank
+    if bank["source"] is source:
+        return bank
+    with _question_bank_lock:
+        if _question_bank["source"] is source:
+            return _question_bank
+        by_id, by_practical = {}, {}
+        for q in source:
+            try:
+                by_id[int(q.get("id", -1))] = q
+            except (ValueError, TypeError):
+                continue
+            by_practical.setdefault(q.get("practical"), []).append(q)
+        _question_bank = {
+            "source": source,
+            "by_id": by_id,
+            "by_practical": {p: tuple(qs) for p, qs in by_practical.items()},
+            "counts": {p: len(qs) for p, qs in by_practical.items()},
+            "next_id": max(by_id, default=0) + 1,
+        }
+        return _question_bank
+
+PAPER_SIZE = 20
+
+def new_paper_seed():
+    return secrets.randbits(48)
+
+def paper_snapshot():
+    """Version of the question bank a new paper is drawn from: the highest question id handed out."""
+    return _question_id_counter()
+
+def _paper_digest(*parts):
+    return hashlib.blake2b("\x1f".join(str(p) for p in parts).encode("utf-8"), digest_size=8).digest()
+
+def generate_paper(practical_name, roll_no, seed, snapshot, size=PAPER_SIZE):
+    """Return the questions of one student's paper in order.
+
+    Each question is a copy whose options are relabelled in shuffled order, with
+    "answer" pointing at the relabelled correct option, so grading against the
+    regenerated paper matches what the student saw.
+    """
+    ranked = []
+    for q in question_bank()["by_practical"].get(practical_name, ()):
+        try:
+            qid = int(q.get("id", -1))
+        except (ValueError, TypeError):
             continue
-        filepath = os.path.join(RESULTS_DIR, filename)
-        content = read_file_safe(filepath)
-        if content is None:
+        if 0 <= qid <= snapshot:
+            ranked.append((_paper_digest(seed, practical_name, roll_no, qid), q))
+    ranked.sort(key=lambda item: item[0])
+
+    paper = []
+    for digest, q in ranked[:size]:
+        options = q.get("options") or {}
+        labels = list(options)
+        order = sorted(labels, key=lambda key: _paper_digest(digest.hex(), key))
+        answer = q.get("answer", "")
+        paper.append(dict(
+            q,
+            options={label: options[key] for label, key in zip(labels, order)},
+            answer=next((label for label, key in zip(labels, order) if key == answer), answer),
+        ))
+    return paper
+
+QUESTIONS_PER_PRACTICAL = 20
+IMPORT_MAX_ROWS = 5000
+
+# Accepted spellings of import columns, after lower-casing and turning spaces/dashes into "_".
+_IMPORT_COLUMNS = {
+    "practical": "practical", "practical_name": "practical",
+    "question": "question", "question_text": "question",
+    "a": "A", "option_a": "A", "b": "B", "option_b": "B",
+    "c": "C", "option_c": "C", "d": "D", "option_d": "D",
+    "answer": "answer", "correct": "answer", "correct_answer": "answer",
+}
+
+def _read_question_id_counter(fd):
+    data = os.pread(fd, 9, 0)
+    if len(data) == 8 and data != b"." * 8:
+        return int.from_bytes(data, "big")
+    return os.fstat(fd).st_size   # older trees padded the file with "." out to the counter
+
+def _question_id_counter(count=0):
+    """Advance the question id counter by `count` and return the highest id handed out.
+
+    The counter is an 8-byte big-endian integer in QUESTION_ID_FILE, rewritten
+    in place under locked_file. It is first raised to the highest id in the
+    bank, so ids written before the counter existed (or by hand) are never
+    handed out again. A plain read (count=0, counter already past the bank)
+    takes no lock, which keeps paper_snapshot() cheap.
+    """
+    floor = question_bank()["next_id"] - 1
+    os.makedirs(os.path.dirname(QUESTION_ID_FILE), exist_ok=True)
+    if not count:
+        try:
+            fd = os.open(QUESTION_ID_FILE, os.O_RDONLY)
+        except FileNotFoundError:
+            pass
+        else:
+            try:
+                current = _read_question_id_counter(fd)
+            finally:
+                os.close(fd)
+            if current >= floor:
+                return current
+    with locked_file(QUESTION_ID_FILE):
+        fd = os.open(QUESTION_ID_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            end = max(_read_question_id_counter(fd), floor) + count
+            os.pwrite(fd, end.to_bytes(8, "big"), 0)
+            os.ftruncate(fd, 8)   # drops a legacy file's padding
+        finally:
+            os.close(fd)
+    return end
+
+def allocate_question_ids(count):
+    """Reserve `count` new question ids. Ids are never handed out twice, even after deletes."""
+    end = _question_id_counter(count)
+    return list(range(end - count + 1, end + 1))
+
+def _import_row(raw):
+    """Normalise one imported row (flat columns or {"options": {...}}) to question fields."""
+    row = {}
+    for key, value in raw.items():
+        if key == "options" and isinstance(value, dict):
+            for opt, text in value.items():
+                row[str(opt).strip().upper()] = text
             continue
-        result_dict = {}
-        for line in content.split('\n'):
-            if '==========' in line:
-                break
-            if ':' in line:
-                key, value = line.split(':', 1)
-                key = key.strip()
-                if key and key not in ('----------',):
-                    result_dict[key] = value.strip()
-        results.append(result_dict)
-    return results
+        column = _IMPORT_COLUMNS.get(re.sub(r"[\s\-]+", "_", str(key or "").strip().lower()))
+        if column:
+            row[column] = value
+    return {k: "" if v is None else str(v).strip() for k, v in row.items()}
+
+def read_upload_rows(data, fmt, key="questions"):
+    """Parse an uploaded table into [(row number, raw dict)]. fmt is "csv", "json" or "xlsx".
+
+    Row numbers are spreadsheet rows for CSV/XLSX (the header is row 1) and
+    1-based item positions for JSON, which may be a list or {key: [...]}.
+    Blank rows are skipped. Raises ValueError for an unreadable file.
+    """
+    if fmt == "json":
+        items = json.loads(data.decode("utf-8-sig") if isinstance(data, bytes) else data)
+        if isinstance(items, dict):
+            items = items.get(key)
+        if not isinstance(items, list):
+            raise ValueError(f'JSON must be a list or {{"{key}": [...]}}')
+        return [(n, item if isinstance(item, dict) else {}) for n, item in enumerate(items, start=1)]
+    if fmt == "csv":
+        text = data.decode("utf-8-sig") if isinstance(data, bytes) else data
+        reader = csv.DictReader(io.StringIO(text))
+        return [(n, item) for n, item in enumerate(reader, start=2)
+                if any((v or "").strip() for v in item.values() if isinstance(v, str))]
+    if fmt == "xlsx":
+        wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+        try:
+            rows = wb.worksheets[0].iter_rows(values_only=True)
+            header = [str(h or "") for h in next(rows, ())]
+            return [(n, dict(zip(header, values))) for n, values in enumerate(rows, start=2)
+                    if any(v not in (None, "") for v in values)]
+        finally:
+            wb.close()
+    raise ValueError(f"Unsupported format {fmt!r}; use csv, json or xlsx")
+
+def read_question_rows(data, fmt):
+    """Parse a question import into [(row number, question fields)]."""
+    return [(n, _import_row(raw)) for n, raw in read_upload_rows(data, fmt)]
+
+def plan_question_import(rows, questions):
+    """Validate import rows against the current `questions`. Returns (added, errors, accepted).
+
+    errors is a list of {"row": n, "message": ...}; added maps practical ->
+    number of questions that would be added; accepted holds the new questions,
+    without ids, in row order.
+    """
+    practicals = set(load_json(PRACTICALS_FILE, readonly=True))
+    counts, seen = {}, set()
+    for q in questions:
+        counts[q.get("practical")] = counts.get(q.get("practical"), 0) + 1
+        seen.add((q.get("practical"), str(q.get("question", "")).strip().lower()))
+    errors, accepted = [], []
+
+    for n, row in rows:
+        practical, text, answer = row.get("practical", ""), row.get("question", ""), row.get("answer", "").upper()
+        problems = []
+        if not practical:
+            problems.append("Practical name required")
+        elif practical not in practicals:
+            problems.append(f"Unknown practical {practical!r}")
+        if not text:
+            problems.append("Question text required")
+        missing = [k for k in "ABCD" if not row.get(k)]
+        if missing:
+            problems.append("Missing option(s) " + ", ".join(missing))
+        if answer not in ("A", "B", "C", "D"):
+            problems.append("Correct answer must be A, B, C or D")
+        if not problems and (practical, text.lower()) in seen:
+            problems.append("Duplicate question for this practical")
+        if not problems and counts.get(practical, 0) >= QUESTIONS_PER_PRACTICAL:
+            problems.append(f"Maximum {QUESTIONS_PER_PRACTICAL} questions allowed per practical")
+        if problems:
+            errors.append({"row": n, "message": "; ".join(problems)})
+            continue
+        counts[practical] = counts.get(practical, 0) + 1
+        seen.add((practical, text.lower()))
+        accepted.append({"practical": practical, "question": text,
+                         "options": {k: row[k] for k in "ABCD"}, "answer": answer})
+
+    added = {}
+    for q in accepted:
+        added[q["practical"]] = added.get(q["practical"], 0) + 1
+    return added, errors, accepted
+
+def import_questions(rows, dry_run=False):
+    """Validate every row, then add all questions in one write. Returns (added, errors).
+
+    Nothing is written if any row has an error. A real import validates against
+    questions.json reloaded under its lock, so caps and duplicates hold even
+    while another worker adds questions.
+    """
+    if len(rows) > IMPORT_MAX_ROWS:
+        return {}, [{"row": None, "message": f"At most {IMPORT_MAX_ROWS} rows per import"}]
+    if dry_run:
+        added, errors, _ = plan_question_import(rows, load_json(QUESTIONS_FILE, readonly=True))
+        return added, errors
+
+    with locked_file(QUESTIONS_FILE):
+        questions = load_json(QUESTIONS_FILE)
+        added, errors, accepted = plan_question_import(rows, questions)
+        if errors or not accepted:
+            return added, errors
+        questions.extend({"id": qid, "practical": q["practical"], "question": q["question"],
+                          "options": q["options"], "answer": q["answer"]}
+                         for q, qid in zip(accepted, allocate_question_ids(len(accepted))))
+        if not save_json(QUESTIONS_FILE, questions):
+            raise IOError("Could not save questions")
+    return added, errors
 
 def get_practical_questions(practical_name):
-    questions = load_json(QUESTIONS_FILE)
-    return [q for q in questions if q.get('practical') == practical_name]
+    return list(question_bank()["by_practical"].get(practical_name, ()))
 
 def get_questions_by_ids(id_list):
     """Fetch full question objects matching a list of IDs (preserves order)."""
     try:
-        questions = load_json(QUESTIONS_FILE)
-        id_set = {int(i) for i in id_list}
-        by_id = {int(q["id"]): q for q in questions if int(q.get("id", -1)) in id_set}
+        by_id = question_bank()["by_id"]
         return [by_id[int(i)] for i in id_list if int(i) in by_id]
     except Exception as e:
         logger.error("get_questions_by_ids error: %s", e)
@@ -160,7 +1180,7 @@ def get_questions_by_ids(id_list):
 
 def get_subject_practicals(subject_id):
     """Get all practicals for a specific subject."""
-    subjects = load_json(SUBJECTS_FILE)
+    subjects = load_json(SUBJECTS_FILE, readonly=True)
     for subject in subjects:
         if subject.get('id') == subject_id:
             return subject.get('practicals', [])
@@ -168,7 +1188,7 @@ def get_subject_practicals(subject_id):
 
 def get_all_practicals_for_subject(subject_name):
     """Get practicals by subject name."""
-    subjects = load_json(SUBJECTS_FILE)
+    subjects = load_json(SUBJECTS_FILE, readonly=True)
     for subject in subjects:
         if subject.get('name') == subject_name:
             return subject.get('practicals', [])
@@ -254,47 +1274,1655 @@ def parse_result_file(filepath):
         return {}
 
 def _find_result_file(roll_no, practical_name):
-    """Find the latest result file for a roll_no + practical_name combo. Returns (filepath, filename) or (None, None)."""
-    if not os.path.exists(RESULTS_DIR):
+    """Find the latest result for a roll_no + practical_name combo. Returns (report path, filename) or (None, None)."""
+    entry = _indexed_results(roll_no).get(practical_name.strip())
+    if not entry:
         return None, None
-    best_ts = -1
-    best_path = None
-    best_name = None
-    for filename in os.listdir(RESULTS_DIR):
-        if not (filename.startswith(f"Result_RollNo_{roll_no}_") and filename.endswith('.txt')):
+    return os.path.join(RESULTS_DIR, entry["filename"]), entry["filename"]
+
+# ─────────────────────────── Result Records ───────────────────────────────────
+#
+# Each submission is stored as Result_RollNo_<roll>_<ts>.json holding the same
+# fields as session["last_result"] plus detailed_answers. The human-readable
+# .txt report with the same stem is only rendered when it is downloaded or
+# viewed as text. Results that predate the records exist only as .txt and are
+# converted to a record the first time they are read.
+
+def _result_record_path(filename):
+    return os.path.join(RESULTS_DIR, os.path.splitext(filename)[0] + ".json")
+
+def _read_result_record(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            record = json.load(f)
+            _io_note("bytes_read", os.fstat(f.fileno()).st_size)
+            _io_note("json_loads")
+            return record
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.error("Could not read result record %s: %s", path, e)
+        return None
+
+def _write_result_record(filename, record):
+    path = _result_record_path(filename)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False, separators=(",", ":"))
+    _io_note("json_dumps")
+    os.replace(tmp_path, path)
+
+def _int_or_str(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return value
+
+def _header_as_record(header):
+    """Map 'Key: value' report header fields onto result record keys."""
+    score = header.get("Score", "")
+    total = score.split('/', 1)[1].strip() if '/' in score else ""
+    return {
+        "roll_no":         header.get("Roll No", ""),
+        "name":            header.get("Name", ""),
+        "branch":          header.get("Branch", ""),
+        "year":            header.get("Year", ""),
+        "batch":           header.get("Batch", "1"),
+        "email":           header.get("Email", ""),
+        "practical_name":  header.get("Practical", ""),
+        "score":           score,
+        "total_questions": _int_or_str(total),
+        "attempted":       _int_or_str(header.get("Attempted", "")),
+        "correct":         _int_or_str(header.get("Correct", "")),
+        "wrong":           _int_or_str(header.get("Wrong", "")),
+        "datetime":        header.get("Date & Time", ""),
+    }
+
+def _record_from_report(filepath):
+    parsed = parse_result_file(filepath)
+    if not parsed:
+        return None
+    record = _header_as_record(parsed)
+    record["detailed_answers"] = []
+    for item in parsed.get("detailed_answers", []):
+        options = {}
+        for opt in item.get("options", []):
+            key, _, text = opt.partition(") ")
+            options[key.strip()] = text
+        record["detailed_answers"].append({
+            "question":       item.get("question", ""),
+            "options":        options,
+            "student_answer": item.get("student_answer", ""),
+            "correct_answer": item.get("correct_answer", ""),
+            "status":         item.get("status", ""),
+        })
+    return record
+
+def load_result_record(filename):
+    """Return the result record for a result filename, converting a legacy .txt report on first read."""
+    record = _submission_state["pending"].get(filename)
+    if record is not None:
+        return record
+    record = _read_result_record(_result_record_path(filename))
+    if record is not None:
+        return record
+    report_path = os.path.join(RESULTS_DIR, filename)
+    if not os.path.exists(report_path):
+        # Accepted by another worker whose writer has not caught up yet.
+        return next((r for _, r in _journaled_submissions("filename", filename)), None)
+    record = _record_from_report(report_path)
+    if record:
+        try:
+            _write_result_record(filename, record)
+        except Exception as e:
+            logger.error("Could not convert %s to a result record: %s", filename, e)
+    return record
+
+def render_result_report(record):
+    """Render a result record as the plain-text report students download."""
+    lines = [
+        f"Roll No: {record.get('roll_no', '')}",
+        f"Name: {record.get('name', '')}",
+        f"Branch: {record.get('branch', '')}",
+        f"Year: {record.get('year', '')}",
+        f"Batch: {record.get('batch', '1')}",
+        f"Email: {record.get('email', '')}",
+        f"Practical: {record.get('practical_name', '')}",
+        f"Score: {record.get('score', '')}",
+        f"Attempted: {record.get('attempted', '')}",
+        f"Correct: {record.get('correct', '')}",
+        f"Wrong: {record.get('wrong', '')}",
+        f"Date & Time: {record.get('datetime', '')}",
+        "",
+        "========== QUESTION WISE RESULT =========="
+    ]
+
+    for q_no, item in enumerate(record.get("detailed_answers", []), 1):
+        lines.append("")
+        lines.append(f"Q{q_no}. {item['question']}")
+        options = item.get("options", {})
+        for key in ["A", "B", "C", "D"]:
+            lines.append(f"   {key}) {options.get(key, '')}")
+        lines.append(f"Your Answer   : {item['student_answer']}")
+        lines.append(f"Correct Answer: {item['correct_answer']}")
+        lines.append(f"Status        : {item['status']}")
+        lines.append("-" * 50)
+    return "\n".join(lines)
+
+def read_result_report(filename):
+    """Text of a result report: the legacy .txt if it exists, otherwise rendered from the record."""
+    report_path = os.path.join(RESULTS_DIR, filename)
+    if os.path.exists(report_path):
+        return read_file_safe(report_path)
+    record = _read_result_record(_result_record_path(filename))
+    return render_result_report(record) if record is not None else None
+
+# ─────────────────────────── Submission Queue ─────────────────────────────────
+#
+# submit_exam grades in the request thread and hands the finished record to
+# enqueue_submission(), which appends it to this worker's journal
+# (data/journal/submissions-<pid>-<ns>.ndjson) and fsyncs before returning. A
+# background writer then writes result records and index entries in batches.
+#
+# Durability: once submit_exam has redirected to /result the submission is on
+# disk in the journal. Each worker holds an exclusive lock on its journal for as
+# long as it lives, so a journal whose lock can be taken belongs to a dead
+# worker; replay_submission_journals() claims those by taking the lock, and runs
+# when the module is imported and again when each forked worker starts.
+# Materializing is idempotent — the same filename, the same index entry — so
+# replaying a journal whose tail was already written is harmless. Until the
+# writer has run, result views read the submission back from the journals, so
+# every worker sees it.
+#
+# After a batch the writer truncates the journal if nothing in it is left
+# pending; otherwise it moves on to a fresh journal and removes the old one once
+# its last submission is written, so journals stay small under steady traffic.
+
+_submission_queue = queue.Queue()
+_submission_lock = threading.Lock()
+_submission_state = {
+    "pending": {},    # filename -> record, accepted by this worker and not yet written
+    "pid": None,
+    "journal": None,  # path of the journal new submissions are appended to
+    "journals": {},   # path -> {"file": open journal, "pending": set(filename)}
+}
+
+def _open_journal():
+    """Create and lock a fresh journal for this worker.
+
+    The file is locked under a `.new` name and only then renamed into place, so
+    replay never sees a journal that nobody holds yet.
+    """
+    os.makedirs(SUBMISSION_JOURNAL_DIR, exist_ok=True)
+    while True:
+        path = os.path.join(SUBMISSION_JOURNAL_DIR, f"submissions-{os.getpid()}-{time.time_ns()}.ndjson")
+        f = open(path + ".new", "a", encoding="utf-8")
+        if _try_lock(f) and os.fstat(f.fileno()).st_nlink:
+            os.rename(path + ".new", path)
+            _submission_state["journals"][path] = {"file": f, "pending": set()}
+            return path
+        f.close()   # a replaying worker got there first and removed it
+
+def _journaled_submissions(field, value):
+    """(filename, record) pairs in any worker's journal whose `field` equals `value`.
+
+    `field` is "filename" or a record field. Lines are matched as text before
+    they are parsed; torn lines and journals removed mid-read are skipped.
+    """
+    needle = f'"{field}":{json.dumps(value, ensure_ascii=False)}'
+    try:
+        names = os.listdir(SUBMISSION_JOURNAL_DIR)
+    except OSError:
+        return []
+    found = []
+    for name in names:
+        if not re.match(r"submissions-[\d-]+\.ndjson$", name):
             continue
-        filepath = os.path.join(RESULTS_DIR, filename)
-        content = read_file_safe(filepath)
-        if content and f"Practical: {practical_name}" in content:
+        try:
+            with open(os.path.join(SUBMISSION_JOURNAL_DIR, name), "r", encoding="utf-8") as f:
+                for line in f:
+                    if needle not in line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    key = entry["filename"] if field == "filename" else entry["record"].get(field)
+                    if key == value:
+                        found.append((entry["filename"], entry["record"]))
+        except OSError:
+            continue
+    return found
+
+def _pending_submissions(roll_no):
+    """Submissions of one student accepted by any worker and not yet written out."""
+    if roll_no not in load_json(USERS_FILE, readonly=True):
+        return []
+    found = dict(_journaled_submissions("roll_no", roll_no))
+    found.update((f, r) for f, r in list(_submission_state["pending"].items()) if r.get("roll_no") == roll_no)
+    return list(found.items())
+
+def submission_queue_depth():
+    """Number of journaled submissions not yet written out by this worker."""
+    return len(_submission_state["pending"])
+
+def _materialize_submissions(items):
+    """Write the result records and index entries for (filename, record) pairs.
+
+    Submissions of accounts deleted since they were queued are dropped, so a
+    roll number registered again starts without them.
+    """
+    users = load_json(USERS_FILE, readonly=True)
+    items = [(filename, record) for filename, record in items if record.get("roll_no") in users]
+    if not items:
+        return
+    for filename, record in items:
+        _write_result_record(filename, record)
+    index_results(items)
+    bump_data_version()
+
+def replay_submission_journals():
+    """Materialize journals left behind by dead workers. Returns the number of submissions replayed."""
+    if not os.path.isdir(SUBMISSION_JOURNAL_DIR):
+        return 0
+    replayed = 0
+    for name in os.listdir(SUBMISSION_JOURNAL_DIR):
+        if not re.match(r"submissions-[\d-]+\.ndjson(?:\.replay-\d+|\.new)?$", name):
+            continue
+        path = os.path.join(SUBMISSION_JOURNAL_DIR, name)
+        try:
+            f = open(path, "r", encoding="utf-8")
+        except OSError:
+            continue   # claimed and removed by another worker
+        with f:
+            # A live worker holds its journal's lock; st_nlink is 0 once another replay removed it.
+            if not _try_lock(f) or not os.fstat(f.fileno()).st_nlink:
+                continue
+            items = []
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue   # torn final line from a crash mid-append
+                items.append((entry["filename"], entry["record"]))
+            if items:
+                _materialize_submissions(items)
+            os.remove(path)
+        replayed += len(items)
+        if items:
+            logger.warning("Replayed %d journaled submission(s) from %s", len(items), name)
+    return replayed
+
+def _submission_writer():
+    while True:
+        items = [_submission_queue.get()]
+        while len(items) < app.config["SUBMISSION_BATCH_SIZE"]:
+            try:
+                items.append(_submission_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            _materialize_submissions(items)
+        except Exception as e:
+            logger.error("Submission writer failed, retrying %d item(s): %s\n%s", len(items), e, traceback.format_exc())
+            time.sleep(1)
+            for item in items:
+                _submission_queue.put(item)
+        else:
+            with _submission_lock:
+                _release_journaled(items)
+        finally:
+            for _ in items:
+                _submission_queue.task_done()
+
+def _release_journaled(items):
+    """Forget written submissions and retire journals with nothing left pending. Caller holds _submission_lock."""
+    journals = _submission_state["journals"]
+    for filename, _ in items:
+        _submission_state["pending"].pop(filename, None)
+        for journal in journals.values():
+            journal["pending"].discard(filename)
+    current = _submission_state["journal"]
+    for path, journal in list(journals.items()):
+        if path != current and not journal["pending"]:
+            os.remove(path)   # removed while still locked, so no replay can claim it
+            journal["file"].close()
+            del journals[path]
+    if not journals[current]["pending"]:
+        journals[current]["file"].truncate(0)   # everything is on disk; start the journal afresh
+    else:
+        _submission_state["journal"] = _open_journal()
+
+def _ensure_submission_writer():
+    """Start this worker's writer thread and journal, replaying orphaned journals first. Caller holds _submission_lock."""
+    if _submission_state["pid"] == os.getpid():
+        return
+    replay_submission_journals()
+    # A forked worker inherits the parent's state but not its threads or its journal's lock.
+    _submission_state["pending"] = {}
+    _submission_state["journals"] = {}
+    _submission_state["journal"] = _open_journal()
+    _submission_state["pid"] = os.getpid()
+    threading.Thread(target=_submission_writer, name="submission-writer", daemon=True).start()
+
+@app.before_request
+def _submission_before_request():
+    if app.config["SUBMISSION_QUEUE"] and _submission_state["pid"] != os.getpid():
+        with _submission_lock:
+            _ensure_submission_writer()
+
+def enqueue_submission(filename, record):
+    """Durably accept a graded submission; it is written out by the background writer."""
+    if not app.config["SUBMISSION_QUEUE"]:
+        _materialize_submissions([(filename, record)])
+        return
+    line = json.dumps({"filename": filename, "record": record}, ensure_ascii=False, separators=(",", ":")) + "\n"
+    with _submission_lock:
+        _ensure_submission_writer()
+        journal = _submission_state["journals"][_submission_state["journal"]]
+        f = journal["file"]
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+        journal["pending"].add(filename)
+        _submission_state["pending"][filename] = record
+    _submission_queue.put((filename, record))
+
+def wait_for_submissions():
+    """Block until every queued submission has been written out."""
+    _submission_queue.join()
+
+# ─────────────────────────── Exam Submission ──────────────────────────────────
+#
+# Besides the /exam form, an exam can be submitted as JSON to /api/exam/submit
+# with the token handed out in the exam bundle. The token is signed with the
+# app secret and names the paper (roll_no, practical, seed, snapshot) and its
+# start time, so a retried submit can still be graded after the session's exam
+# keys were cleared by an earlier attempt whose response never arrived. Result
+# filenames are derived from the exam start, so two copies of the same submit
+# racing in different workers write the same record; once a result for the
+# practical exists, a repeat with the same paper gets that result back.
+
+app.config.setdefault("EXAM_SUBMIT_GRACE_SECONDS", 600)
+
+_exam_tokens = URLSafeSerializer(app.secret_key, salt="spas-exam-submit")
+
+def exam_submission_token(roll_no, practical_name, seed, snapshot, start_time, duration):
+    return _exam_tokens.dumps({"r": roll_no, "p": practical_name, "s": seed, "v": snapshot,
+                               "t": start_time, "d": duration})
+
+def read_exam_token(token):
+    """Return the exam named by a submission token, or None if the token is not valid."""
+    try:
+        data = _exam_tokens.loads(token or "")
+        return {"roll_no": data["r"], "practical_name": data["p"], "seed": data["s"],
+                "snapshot": data["v"], "start_time": data["t"], "duration": data["d"]}
+    except (BadSignature, KeyError, TypeError):
+        return None
+
+def exam_result_filename(roll_no, start_time):
+    return f"Result_RollNo_{roll_no}_{int(start_time)}.txt"
+
+def exam_bundle(roll_no, practical_name, seed, snapshot, start_time, duration):
+    """Everything the exam page needs as one JSON-able dict (no correct answers)."""
+    return {
+        "practical_name": practical_name,
+        "remaining": max(0, int(start_time + duration - time.time())),
+        "duration": duration,
+        "token": exam_submission_token(roll_no, practical_name, seed, snapshot, start_time, duration),
+        "submit_url": url_for("api_exam_submit"),
+        "telemetry_url": url_for("api_telemetry"),
+        "questions": [{"id": q.get("id"), "question": q.get("question", ""), "options": q.get("options", {})}
+                      for q in generate_paper(practical_name, roll_no, seed, snapshot)],
+    }
+
+def grade_paper(user, practical_name, questions, submitted_answers, paper_seed, paper_snapshot_id, client_counts=None):
+    """Score {question id: option label} answers against a generated paper and return the result record.
+
+    client_counts are the proctoring totals the exam page sends with the submit;
+    see merge_telemetry_counts().
+    """
+    total     = len(questions)
+    correct   = 0
+    attempted = 0
+    detailed_answers = []
+
+    for q in questions:
+        qid        = str(q.get("id", ""))
+        ans        = submitted_answers.get(qid)
+        q_answer   = q.get("answer", "")
+        is_correct = bool(ans and ans == q_answer)
+
+        if ans:
+            attempted += 1
+            if is_correct:
+                correct += 1
+
+        detailed_answers.append({
+            "id":             q.get("id"),
+            "question":       q.get("question", ""),
+            "options":        q.get("options", {}),
+            "student_answer": ans if ans else "NOT ATTEMPTED",
+            "correct_answer": q_answer,
+            "status":         "CORRECT" if is_correct else ("WRONG" if ans else "NOT ATTEMPTED")
+        })
+
+    return {
+        "roll_no":         user.get("roll_no", ""),
+        "name":            user.get("full_name", ""),
+        "branch":          user.get("branch", ""),
+        "year":            user.get("year", ""),
+        "batch":           user.get("batch", "1"),
+        "email":           user.get("email", ""),
+        "practical_name":  practical_name,
+        "score":           f"{correct} / {total}",
+        "total_questions": total,
+        "attempted":       attempted,
+        "correct":         correct,
+        "wrong":           total - correct,
+        "datetime":        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "paper_seed":      paper_seed,
+        "paper_snapshot":  paper_snapshot_id,
+        "telemetry":       merge_telemetry_counts(telemetry_counts(user.get("roll_no", ""), paper_seed),
+                                                  client_counts),
+        "detailed_answers": detailed_answers
+    }
+
+# ─────────────────────────── Proctoring Telemetry ─────────────────────────────
+#
+# The exam page batches proctoring events (tab switches, copy/cut/paste and
+# context-menu attempts) and sends them with navigator.sendBeacon to
+# /api/telemetry, which only appends them to this worker's in-memory buffer. A
+# background thread drains the buffer every TELEMETRY_FLUSH_SECONDS: the
+# per-exam counts are added to the telemetry_counts table of the session store
+# in one transaction, so every worker can read them, and the raw events are
+# appended to TELEMETRY_DIR/events-<pid>.ndjson in one write. Each worker's log
+# is rotated at TELEMETRY_ROTATE_BYTES and the newest TELEMETRY_KEEP rotated
+# files are kept. Grading flushes this worker's buffer and copies the exam's
+# counts into the result record. The last beacon can still sit in another
+# worker's buffer at that point, so the page also sends its running totals with
+# the submit and the record keeps the larger of the two counts per event.
+
+TELEMETRY_DIR = os.path.join(DATA_DIR, "telemetry")
+TELEMETRY_EVENTS = ("tab_switch", "copy", "cut", "paste", "context_menu")
+TELEMETRY_MAX_BATCH = 100
+TELEMETRY_MAX_COUNT = 10000   # cap on a count reported by the client
+
+app.config.setdefault("TELEMETRY_FLUSH_SECONDS", 1.0)
+app.config.setdefault("TELEMETRY_ROTATE_BYTES", 16 * 1024 * 1024)
+app.config.setdefault("TELEMETRY_KEEP", 10)
+
+_telemetry = {"buffer": [], "pid": None}
+_telemetry_lock = threading.Lock()
+
+def telemetry_exam_key(roll_no, seed):
+    return f"{roll_no}:{seed}"
+
+def record_telemetry(exam_info, events):
+    """Buffer a batch of client events for an exam. Returns the number accepted."""
+    received = round(time.time(), 3)
+    exam_key = telemetry_exam_key(exam_info["roll_no"], exam_info["seed"])
+    accepted = []
+    for event in events[:TELEMETRY_MAX_BATCH]:
+        if not isinstance(event, dict) or event.get("type") not in TELEMETRY_EVENTS:
+            continue
+        at = event.get("at")
+        accepted.append({"exam": exam_key, "roll_no": exam_info["roll_no"],
+                         "practical": exam_info["practical_name"], "type": event["type"],
+                         "at": at if isinstance(at, (int, float)) else None, "received": received})
+    if accepted:
+        _ensure_telemetry_flusher()
+        with _telemetry_lock:
+            _telemetry["buffer"].extend(accepted)
+        metrics_inc("spas_telemetry_events_total", len(accepted))
+    return len(accepted)
+
+def _telemetry_log_path():
+    return os.path.join(TELEMETRY_DIR, f"events-{os.getpid()}.ndjson")
+
+def _rotate_telemetry_log(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    os.replace(path, os.path.join(TELEMETRY_DIR, f"{stem}-{int(time.time() * 1000)}.ndjson"))
+    rotated = sorted(f for f in os.listdir(TELEMETRY_DIR) if f.startswith(stem + "-"))
+    for old in rotated[:-app.config["TELEMETRY_KEEP"]]:
+        try:
+            os.remove(os.path.join(TELEMETRY_DIR, old))
+        except OSError:
+            pass
+
+def flush_telemetry():
+    """Write out this worker's buffered events. Returns the number written."""
+    with _telemetry_lock:
+        events, _telemetry["buffer"] = _telemetry["buffer"], []
+    if not events:
+        return 0
+
+    counts = {}
+    for event in events:
+        counts[(event["exam"], event["type"])] = counts.get((event["exam"], event["type"]), 0) + 1
+    now = time.time()
+    conn = _session_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            "INSERT INTO telemetry_counts (exam, event, count, updated) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (exam, event) DO UPDATE SET count = count + excluded.count, updated = excluded.updated",
+            [(exam, event, n, now) for (exam, event), n in counts.items()])
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        with _telemetry_lock:
+            _telemetry["buffer"][:0] = events   # retried on the next flush
+        raise
+
+    os.makedirs(TELEMETRY_DIR, exist_ok=True)
+    path = _telemetry_log_path()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(json.dumps(e, ensure_ascii=False, separators=(",", ":")) + "\n" for e in events))
+        f.flush()
+        size = os.fstat(f.fileno()).st_size
+    if size >= app.config["TELEMETRY_ROTATE_BYTES"]:
+        _rotate_telemetry_log(path)
+    return len(events)
+
+def telemetry_counts(roll_no, seed):
+    """Proctoring event counts recorded so far for one exam, e.g. {"tab_switch": 2, "paste": 1}."""
+    try:
+        flush_telemetry()
+    except (OSError, sqlite3.Error) as e:
+        logger.error("Telemetry flush failed: %s", e)
+    rows = _session_db().execute("SELECT event, count FROM telemetry_counts WHERE exam = ?",
+                                 (telemetry_exam_key(roll_no, seed),))
+    return dict(rows)
+
+def merge_telemetry_counts(counts, client_counts):
+    """Combine stored counts with the totals reported by the exam page, keeping the larger per event.
+
+    client_counts may be a dict or its JSON text (the form submit); anything
+    malformed is ignored, and a client cannot lower a stored count.
+    """
+    if isinstance(client_counts, str):
+        try:
+            client_counts = json.loads(client_counts)
+        except ValueError:
+            client_counts = None
+    merged = dict(counts)
+    if not isinstance(client_counts, dict):
+        return merged
+    for event in TELEMETRY_EVENTS:
+        value = client_counts.get(event)
+        if isinstance(value, int) and not isinstance(value, bool) and value > merged.get(event, 0):
+            merged[event] = min(value, TELEMETRY_MAX_COUNT)
+    return merged
+
+def _telemetry_flusher():
+    while True:
+        time.sleep(app.config["TELEMETRY_FLUSH_SECONDS"])
+        try:
+            flush_telemetry()
+        except Exception as e:
+            logger.error("Telemetry flush failed: %s", e)
+
+def _ensure_telemetry_flusher():
+    if _telemetry["pid"] == os.getpid():
+        return
+    with _telemetry_lock:
+        if _telemetry["pid"] == os.getpid():
+            return
+        _telemetry["pid"] = os.getpid()
+    threading.Thread(target=_telemetry_flusher, name="telemetry-flusher", daemon=True).start()
+
+# ─────────────────────────── Roster Import ────────────────────────────────────
+#
+# Faculty upload a class roster (CSV/XLSX, or JSON) to create or update many
+# students in one go instead of each student registering. Every row is checked
+# against the file and the current users first; the report lists the students
+# that would be created or updated and any row errors, and nothing is written
+# if there are errors or it is a dry run. The write itself reloads users.json
+# under locked_file(), applies the changes and saves once, so registrations
+# made in other workers meanwhile are kept.
+
+ROSTER_FIELDS = ("full_name", "branch", "year", "batch", "email")
+
+_ROSTER_COLUMNS = {
+    "roll": "roll_no", "roll_no": "roll_no", "rollno": "roll_no", "roll_number": "roll_no",
+    "name": "full_name", "full_name": "full_name", "student_name": "full_name",
+    "branch": "branch", "year": "year", "batch": "batch",
+    "email": "email", "e_mail": "email", "email_id": "email", "password": "password",
+}
+
+def _roster_row(raw):
+    row = {}
+    for key, value in raw.items():
+        column = _ROSTER_COLUMNS.get(re.sub(r"[\s\-]+", "_", str(key or "").strip().lower()))
+        if column and value is not None:
+            text = str(value).strip()
+            # spreadsheets hand back numeric cells as 235134.0
+            row[column] = text[:-2] if isinstance(value, float) and text.endswith(".0") else text
+    return row
+
+def read_roster_rows(data, fmt):
+    """Parse a roster upload into [(row number, student fields)]."""
+    return [(n, _roster_row(raw)) for n, raw in read_upload_rows(data, fmt, key="students")]
+
+def _assign_batches(rolls, batches):
+    """Split roll numbers, in roll order, into `batches` consecutive groups numbered from 1."""
+    ordered = sorted(rolls, key=lambda r: (len(r), r))
+    size = -(-len(ordered) // batches) if ordered else 1
+    return {roll: str(i // size + 1) for i, roll in enumerate(ordered)}
+
+def plan_roster_import(rows, users, batches=None, update_existing=True):
+    """Work out what importing rows into users would do. Returns (report, changes).
+
+    changes maps roll_no -> the full student dict to save. With `batches`, new
+    students whose row has no batch are spread over that many batches in roll order.
+    """
+    errors, seen_rolls, seen_emails = [], {}, {}
+    emails = {u.get("email", "").strip().lower(): roll for roll, u in users.items() if u.get("email", "").strip()}
+    valid = []
+
+    for n, row in rows:
+        roll, problems = row.get("roll_no", ""), []
+        if not roll:
+            problems.append("Roll number required")
+        elif re.search(r"\s", roll):
+            problems.append("Roll number must not contain spaces")
+        elif roll in seen_rolls:
+            problems.append(f"Duplicate roll number (also on row {seen_rolls[roll]})")
+        if roll and roll not in users and not row.get("full_name"):
+            problems.append("Name required for a new student")
+        if row.get("password") and len(row["password"]) < 6:
+            problems.append("Password must be at least 6 characters")
+        if row.get("batch") and not (row["batch"].isdigit() and int(row["batch"]) > 0):
+            problems.append("Batch must be a positive number")
+        email = row.get("email", "").lower()
+        if email:
+            if email in seen_emails:
+                problems.append(f"Duplicate email (also on row {seen_emails[email]})")
+            elif emails.get(email, roll) != roll:
+                problems.append(f"Email already used by roll number {emails[email]}")
+        if roll and roll in users and not update_existing:
+            problems.append("Student already exists")
+        if problems:
+            errors.append({"row": n, "message": "; ".join(problems)})
+        else:
+            valid.append(row)
+        if roll:
+            seen_rolls.setdefault(roll, n)
+        if email:
+            seen_emails.setdefault(email, n)
+
+    unbatched = [r["roll_no"] for r in valid if not r.get("batch") and r["roll_no"] not in users]
+    assigned = _assign_batches(unbatched, batches) if batches else {}
+    report = {"created": [], "updated": [], "unchanged": 0, "errors": errors}
+    changes = {}
+    for row in valid:
+        roll = row["roll_no"]
+        if roll in assigned:
+            row["batch"] = assigned[roll]
+        current = users.get(roll)
+        if current is None:
+            student = {"roll_no": roll, "password": row.get("password", ""), "full_name": row.get("full_name", ""),
+                       "branch": row.get("branch", ""), "year": row.get("year", ""),
+                       "batch": row.get("batch") or "1", "email": row.get("email", "")}
+            changes[roll] = student
+            report["created"].append({"roll_no": roll, "batch": student["batch"],
+                                      "password": "given" if student["password"] else "generated"})
+            continue
+        changed = [f for f in ROSTER_FIELDS + ("password",) if row.get(f) and row[f] != current.get(f)]
+        if changed:
+            changes[roll] = dict(current, **{f: row[f] for f in changed})
+            report["updated"].append({"roll_no": roll, "fields": changed})
+        else:
+            report["unchanged"] += 1
+    return report, changes
+
+def import_roster(rows, batches=None, update_existing=True, dry_run=False):
+    """Validate a roster and, unless there are errors or dry_run, save it in one locked write.
+
+    Returns the report from plan_roster_import(). After a real import, each
+    created student whose row had no password gets a generated one, listed
+    in the report so it can be handed out.
+    """
+    if dry_run:
+        report, _ = plan_roster_import(rows, load_json(USERS_FILE, readonly=True), batches, update_existing)
+        return report
+    with locked_file(USERS_FILE):
+        users = load_json(USERS_FILE)
+        report, changes = plan_roster_import(rows, users, batches, update_existing)
+        if report["errors"] or not changes:
+            return report
+        for entry in report["created"]:
+            student = changes[entry["roll_no"]]
+            if not student["password"]:
+                student["password"] = entry["password"] = secrets.token_urlsafe(6)
+        users.update(changes)
+        if not save_json(USERS_FILE, users):
+            raise IOError("Could not save students")
+    bump_data_version()
+    return report
+
+# ─────────────────────────── Data Version & Export Cache ──────────────────────
+#
+# The data version is an 8-byte big-endian counter in DATA_VERSION_FILE: every
+# change that can alter an export increments it in place under locked_file, so
+# the file never grows. Exports are cached on disk keyed by their filters and
+# the data version, so a new submission or profile edit makes every older entry
+# unreachable; those age out through LRU eviction. A cache hit is handed out as
+# an open file, so eviction by another worker cannot pull it from under
+# send_file.
+
+def _read_data_version(f):
+    data = f.read()
+    # Older trees appended one byte per change; that file's size was the version.
+    return int.from_bytes(data, "big") if len(data) == 8 else len(data)
+
+def data_version():
+    try:
+        with open(DATA_VERSION_FILE, "rb") as f:
+            return _read_data_version(f)
+    except OSError:
+        return 0
+
+def bump_data_version():
+    with locked_file(DATA_VERSION_FILE):
+        with open(DATA_VERSION_FILE, "a+b") as f:
+            f.seek(0)
+            version = _read_data_version(f) + 1
+            f.truncate(0)
+            f.write(version.to_bytes(8, "big"))
+
+def _export_cache_path(kind, version, *key):
+    """Cache path for an export built from data read at `version`.
+
+    Callers take the version before loading anything, so a change landing
+    mid-build leaves the entry under the older version instead of caching stale
+    data under the newer one.
+    """
+    digest = hashlib.sha1(json.dumps([kind, *key, version]).encode("utf-8")).hexdigest()
+    return os.path.join(EXPORT_CACHE_DIR, f"{kind}-{digest}")
+
+def _export_cache_get(path):
+    """Return the cached file opened for reading (marking it recently used), else None."""
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass   # evicted meanwhile; the open file is still readable
+    return f
+
+def _export_cache_put(path, build):
+    """Run build(fileobj) into the cache atomically, evict down to the size cap, return the entry opened for reading."""
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        build(f)
+    # Open before publishing so eviction by another worker cannot remove it first;
+    # Windows cannot rename an open file, but it cannot delete one either.
+    result = open(tmp_path, "rb") if os.name == "posix" else None
+    os.replace(tmp_path, path)
+    result = result or open(path, "rb")
+
+    entries = []
+    for name in os.listdir(EXPORT_CACHE_DIR):
+        if name.endswith(".tmp"):
+            continue
+        try:
+            st = os.stat(os.path.join(EXPORT_CACHE_DIR, name))
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= app.config["EXPORT_CACHE_MAX_BYTES"]:
+            break
+        if os.path.join(EXPORT_CACHE_DIR, name) == path:
+            continue
+        try:
+            os.remove(os.path.join(EXPORT_CACHE_DIR, name))
+            total -= size
+        except OSError:
+            pass
+    return result
+
+def set_attachment(response, filename):
+    """Mark `response` as a download named `filename`, quoted the way send_file does it.
+
+    Non-ASCII names get an ASCII fallback plus an RFC 5987 filename* parameter.
+    """
+    try:
+        filename.encode("ascii")
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize("NFKD", filename).encode("ascii", "ignore").decode("ascii")
+        names = {"filename": simple, "filename*": "UTF-8''" + quote(filename, safe="!#$&+-.^_`|~")}
+    else:
+        names = {"filename": filename}
+    response.headers.set("Content-Disposition", "attachment", **names)
+
+def _write_performance_workbook(fileobj, students, practicals):
+    """Write the student performance sheet as xlsx to fileobj."""
+    # Write-only mode streams rows to disk instead of keeping every cell in
+    # memory, but it emits column widths before the first row. Text widths
+    # come from the student records; score columns are sized by their header.
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Student Performance")
+
+    header_font = Font(bold=True, color="FFFFFF", size=11)
+    header_fill = PatternFill(start_color="1976D2", end_color="1976D2", fill_type="solid")
+    header_alignment = Alignment(horizontal="center", vertical="center")
+    border = Border(
+        left=Side(style='thin'), right=Side(style='thin'),
+        top=Side(style='thin'), bottom=Side(style='thin')
+    )
+    center_align = Alignment(horizontal="center")
+    bold_font = Font(bold=True)
+
+    headers = ["Roll No", "Name", "Branch", "Year", "Batch"] + list(practicals) + ["Total", "Average"]
+    widths = [len(h) for h in headers]
+    for roll_no, student in students.items():
+        for col_idx, val in enumerate([roll_no, student.get("full_name", ""), student.get("branch", ""),
+                                       student.get("year", ""), student.get("batch", "1")]):
+            widths[col_idx] = max(widths[col_idx], len(str(val)))
+    widths[-2] = max(widths[-2], len(str(20 * len(practicals))))
+    widths[-1] = max(widths[-1], len(f"{20:.2f}"))
+    for col_idx, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = min(width + 2, 30)
+
+    def styled(value, font=None, fill=None, alignment=None):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.border = border
+        if font:
+            cell.font = font
+        if fill:
+            cell.fill = fill
+        if alignment:
+            cell.alignment = alignment
+        return cell
+
+    ws.append([styled(h, header_font, header_fill, header_alignment) for h in headers])
+
+    for roll_no, perf in iter_student_performance(students, practicals):
+        cells = [styled(val) for val in (roll_no, perf["name"], perf["branch"], perf["year"], perf["batch"])]
+        for practical in practicals:
+            score = perf["practical_scores"].get(practical)
+            cells.append(styled(score, alignment=center_align) if score is not None else styled("-"))
+        cells.append(styled(perf["total"], bold_font, alignment=center_align))
+        cells.append(styled(perf["average"], bold_font, alignment=center_align))
+        ws.append(cells)
+
+    wb.save(fileobj)
+
+# ─────────────────────────── Sessions ─────────────────────────────────────────
+#
+# Session data is kept server-side in SESSION_FILE (SQLite in WAL mode, shared by
+# every gunicorn worker on the host) and the cookie only carries a random id.
+# Each write stores a fresh random version; workers keep decoded sessions in an
+# in-memory front cache and reuse them while the stored version still matches,
+# so reading a session is one indexed lookup. A session expires after
+# SESSION_LIFETIME_SECONDS without a request and expired rows, abandoned exams
+# included, are swept at most every SESSION_SWEEP_SECONDS per worker. Logging in
+# moves the session to a new id (regenerate_session), so an id planted in a
+# browser before login is worthless afterwards.
+# SESSION_STORE = "cookie" switches back to Flask's signed-cookie sessions.
+
+SESSION_FILE = os.path.join(DATA_DIR, "sessions.sqlite3")
+SESSION_CACHE_MAX = 10000
+
+app.config.setdefault("SESSION_STORE", os.environ.get("SPAS_SESSION_STORE", "sqlite"))
+app.config.setdefault("SESSION_LIFETIME_SECONDS", 8 * 3600)
+app.config.setdefault("SESSION_SWEEP_SECONDS", 300)
+
+_session_local = threading.local()
+_session_cache = {}   # sid -> (version, data)
+_session_state = {"swept": 0.0}
+_session_lock = threading.Lock()
+_session_serializer = TaggedJSONSerializer()
+
+def _session_db():
+    conn = getattr(_session_local, "conn", None)
+    if conn is None or _session_local.pid != os.getpid():
+        os.makedirs(os.path.dirname(SESSION_FILE), exist_ok=True)
+        conn = sqlite3.connect(SESSION_FILE, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, version INTEGER NOT NULL, "
+                     "expires REAL NOT NULL, data TEXT NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires)")
+        conn.execute("CREATE TABLE IF NOT EXISTS telemetry_counts (exam TEXT NOT NULL, event TEXT NOT NULL, "
+                     "count INTEGER NOT NULL, updated REAL NOT NULL, PRIMARY KEY (exam, event))")
+        _session_local.conn, _session_local.pid = conn, os.getpid()
+    return conn
+
+def sweep_sessions(now=None):
+    """Delete expired sessions from the store and the front cache. Returns the number of rows removed."""
+    now = now or time.time()
+    removed = _session_db().execute("DELETE FROM sessions WHERE expires < ?", (now,)).rowcount
+    _session_db().execute("DELETE FROM telemetry_counts WHERE updated < ?",
+                          (now - app.config["SESSION_LIFETIME_SECONDS"],))
+    _session_state["swept"] = now
+    if removed:
+        live = {sid for (sid,) in _session_db().execute("SELECT sid FROM sessions")}
+        with _session_lock:
+            for sid in [s for s in _session_cache if s not in live]:
+                del _session_cache[sid]
+    return removed
+
+def _cache_session(sid, version, data):
+    with _session_lock:
+        _session_cache.pop(sid, None)
+        while len(_session_cache) >= SESSION_CACHE_MAX:
+            _session_cache.pop(next(iter(_session_cache)))
+        _session_cache[sid] = (version, data)
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, expires=0.0):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires = expires
+        self.new = sid is None
+        self.modified = False
+        self.replaced_sid = None
+
+    def regenerate(self):
+        """Move the session to a fresh sid when the response is saved; the old row is deleted."""
+        if self.sid is not None:
+            self.replaced_sid = self.sid
+        self.sid = None
+        self.new = self.modified = True
+
+def regenerate_session():
+    """Issue a fresh session id for the current session, e.g. on login, so a planted sid is useless."""
+    if isinstance(session._get_current_object(), ServerSession):
+        session.regenerate()
+
+class ServerSessionInterface(SessionInterface):
+    cookie_sessions = SecureCookieSessionInterface()
+
+    def open_session(self, app, request):
+        if app.config["SESSION_STORE"] == "cookie":
+            return self.cookie_sessions.open_session(app, request)
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid or len(sid) > 64:
+            return ServerSession()
+        row = _session_db().execute("SELECT version, expires FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        if row is None or row[1] < time.time():
+            return ServerSession()
+        version, expires = row
+        cached = _session_cache.get(sid)
+        if cached is None or cached[0] != version:
+            row = _session_db().execute("SELECT version, data FROM sessions WHERE sid = ?", (sid,)).fetchone()
+            if row is None:
+                return ServerSession()
+            cached = (row[0], _session_serializer.loads(row[1]))
+            _cache_session(sid, *cached)
+        return ServerSession(_thaw(cached[1]), sid, expires)
+
+    def save_session(self, app, session, response):
+        if not isinstance(session, ServerSession):
+            return self.cookie_sessions.save_session(app, session, response)
+        name, domain, path = self.get_cookie_name(app), self.get_cookie_domain(app), self.get_cookie_path(app)
+        now = time.time()
+        lifetime = app.config["SESSION_LIFETIME_SECONDS"]
+        if now - _session_state["swept"] >= app.config["SESSION_SWEEP_SECONDS"]:
+            try:
+                sweep_sessions(now)
+            except sqlite3.Error as e:
+                logger.error("Session sweep failed: %s", e)
+
+        if session.replaced_sid is not None:
+            _session_db().execute("DELETE FROM sessions WHERE sid = ?", (session.replaced_sid,))
+            _session_cache.pop(session.replaced_sid, None)
+        if not session:
+            if session.sid is not None or session.replaced_sid is not None:
+                _session_db().execute("DELETE FROM sessions WHERE sid = ?", (session.sid,))
+                _session_cache.pop(session.sid, None)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        sid = session.sid or secrets.token_urlsafe(32)
+        if session.modified or session.new:
+            data = dict(session)
+            version = secrets.randbits(62)
+            _session_db().execute("INSERT OR REPLACE INTO sessions (sid, version, expires, data) VALUES (?, ?, ?, ?)",
+                                  (sid, version, now + lifetime, _session_serializer.dumps(data)))
+            _cache_session(sid, version, data)
+        elif session.expires - now < lifetime / 2:
+            # sliding expiry, written at most once per half lifetime for read-only requests
+            _session_db().execute("UPDATE sessions SET expires = ? WHERE sid = ?", (now + lifetime, sid))
+        else:
+            return
+        response.vary.add("Cookie")
+        response.set_cookie(name, sid, max_age=lifetime, httponly=self.get_cookie_httponly(app),
+                            secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app),
+                            domain=domain, path=path)
+
+app.session_interface = ServerSessionInterface()
+
+# ─────────────────────────── Metrics ──────────────────────────────────────────
+#
+# Counters, gauges and histograms kept in this worker and written to
+# METRICS_DIR/metrics-<pid>-<start ns>.json by a background thread every
+# METRICS_FLUSH_SECONDS while anything changed. Each worker holds an exclusive
+# lock on the matching .lock file for its lifetime, so a reused pid never
+# shares a file with a dead worker. /metrics merges every worker's file into one
+# Prometheus text page. A snapshot whose lock can be taken belongs to a worker
+# that has exited: its counters and histograms are folded into
+# metrics-retired.json and the snapshot is deleted, so totals never go
+# backwards; gauges only count live workers. Scraping is allowed for logged-in
+# faculty, for addresses in METRICS_ALLOW (IPs or CIDR ranges, comma separated)
+# and for requests bearing METRICS_TOKEN. METRICS_ALLOW is empty by default:
+# behind a reverse proxy on the same host every request arrives from loopback,
+# so allowing 127.0.0.1 would open /metrics to the internet.
+
+METRICS_DIR = os.path.join(DATA_DIR, "metrics")
+METRICS_RETIRED_FILE = os.path.join(METRICS_DIR, "metrics-retired.json")
+METRICS_FLUSH_SECONDS = 1.0
+
+app.config.setdefault("METRICS_ALLOW", os.environ.get("SPAS_METRICS_ALLOW", ""))
+app.config.setdefault("METRICS_TOKEN", os.environ.get("SPAS_METRICS_TOKEN", ""))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+METRIC_HELP = {
+    "spas_http_requests_total": ("counter", "Requests handled, by endpoint, method and status."),
+    "spas_http_request_duration_seconds": ("histogram", "Time spent in the view, by endpoint and method."),
+    "spas_http_response_size_bytes": ("histogram", "Response body size where known, by endpoint."),
+    "spas_http_requests_in_flight": ("gauge", "Requests currently being handled."),
+    "spas_exams_started_total": ("counter", "Exams started from the student dashboard."),
+    "spas_submissions_total": ("counter", "Exam submissions accepted."),
+    "spas_export_duration_seconds": ("histogram", "Time to produce an export, by format and cache result."),
+    "spas_export_cache_requests_total": ("counter", "Excel export cache lookups, by result."),
+    "spas_json_cache_requests_total": ("counter", "load_json cache lookups, by result."),
+    "spas_submission_queue_depth": ("gauge", "Submissions accepted but not yet written out."),
+    "spas_telemetry_events_total": ("counter", "Proctoring events received from exam pages."),
+}
+
+_metrics = {"counters": {}, "gauges": {}, "histograms": {}, "dirty": False, "pid": None, "name": None, "lock": None}
+_metrics_lock = threading.Lock()
+
+def _metric_key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+def metrics_inc(name, amount=1, **labels):
+    key = _metric_key(name, labels)
+    with _metrics_lock:
+        _metrics["counters"][key] = _metrics["counters"].get(key, 0) + amount
+        _metrics["dirty"] = True
+
+def metrics_gauge_add(name, amount, **labels):
+    key = _metric_key(name, labels)
+    with _metrics_lock:
+        _metrics["gauges"][key] = _metrics["gauges"].get(key, 0) + amount
+        _metrics["dirty"] = True
+
+def metrics_observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    key = _metric_key(name, labels)
+    with _metrics_lock:
+        hist = _metrics["histograms"].get(key)
+        if hist is None:
+            hist = _metrics["histograms"][key] = {"le": list(buckets), "counts": [0] * (len(buckets) + 1),
+                                                  "sum": 0.0}
+        for i, bound in enumerate(hist["le"]):
+            if value <= bound:
+                hist["counts"][i] += 1
+                break
+        else:
+            hist["counts"][-1] += 1
+        hist["sum"] += value
+        _metrics["dirty"] = True
+
+def _metrics_snapshot():
+    """This worker's metrics as JSON-serialisable lists, including the process-local cache and queue figures."""
+    cache = json_cache_stats()
+    with _metrics_lock:
+        _metrics["dirty"] = False
+        counters = [[n, dict(l), v] for (n, l), v in _metrics["counters"].items()]
+        gauges = [[n, dict(l), v] for (n, l), v in _metrics["gauges"].items()]
+        histograms = [[n, dict(l), h["le"], list(h["counts"]), h["sum"]] for (n, l), h in _metrics["histograms"].items()]
+    counters.append(["spas_json_cache_requests_total", {"result": "hit"}, cache["hits"]])
+    counters.append(["spas_json_cache_requests_total", {"result": "miss"}, cache["misses"]])
+    gauges.append(["spas_submission_queue_depth", {}, submission_queue_depth()])
+    return {"pid": os.getpid(), "counters": counters, "gauges": gauges, "histograms": histograms}
+
+def flush_metrics():
+    """Write this worker's snapshot to METRICS_DIR."""
+    try:
+        _ensure_metrics_flusher()
+        path = os.path.join(METRICS_DIR, _metrics["name"] + ".json")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(_metrics_snapshot(), f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.error("Could not write metrics snapshot: %s", e)
+
+def _metrics_flusher():
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        if _metrics["dirty"]:
+            flush_metrics()
+
+def _ensure_metrics_flusher():
+    """Name and lock this worker's snapshot file and start its flusher thread."""
+    if _metrics["pid"] == os.getpid():
+        return
+    with _metrics_lock:
+        if _metrics["pid"] == os.getpid():
+            return
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        name = f"metrics-{os.getpid()}-{time.time_ns()}"
+        lock = open(os.path.join(METRICS_DIR, name + ".lock"), "a+b")
+        _try_lock(lock)   # a fresh file; held until this process exits
+        _metrics["name"], _metrics["lock"], _metrics["pid"] = name, lock, os.getpid()
+    threading.Thread(target=_metrics_flusher, name="metrics-flusher", daemon=True).start()
+
+def _metrics_after_fork():
+    """Start a forked child from zero: whatever the parent counted is in the parent's own file."""
+    global _metrics_lock
+    _metrics_lock = threading.Lock()
+    _metrics.update(counters={}, gauges={}, histograms={}, dirty=False)
+    _json_cache_stats.update(hits=0, misses=0)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_metrics_after_fork)
+
+def _read_metrics_file(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _merge_metrics(snap, counters, histograms, gauges=None):
+    """Add a snapshot's counters and histograms (and gauges, if given) into the running totals."""
+    for n, labels, value in snap["counters"]:
+        key = _metric_key(n, labels)
+        counters[key] = counters.get(key, 0) + value
+    if gauges is not None:
+        for n, labels, value in snap["gauges"]:
+            key = _metric_key(n, labels)
+            gauges[key] = gauges.get(key, 0) + value
+    for n, labels, le, counts, total in snap["histograms"]:
+        key = _metric_key(n, labels)
+        hist = histograms.setdefault(key, {"le": le, "counts": [0] * len(counts), "sum": 0.0})
+        if hist["le"] == le:
+            hist["counts"] = [a + b for a, b in zip(hist["counts"], counts)]
+            hist["sum"] += total
+
+def _retire_metrics(stems):
+    """Fold the snapshots of exited workers into METRICS_RETIRED_FILE and delete them. Caller holds its lock.
+
+    The retired file lists the snapshots already folded, so one left behind by a
+    crash between the write and the delete is not counted twice.
+    """
+    retired = _read_metrics_file(METRICS_RETIRED_FILE) or {"counters": [], "histograms": [], "folded": []}
+    counters, histograms = {}, {}
+    _merge_metrics(retired, counters, histograms)
+    folded = [stem for stem in retired.get("folded", [])
+              if os.path.exists(os.path.join(METRICS_DIR, stem + ".json"))]
+    for stem in stems:
+        if stem in folded:
+            continue
+        snap = _read_metrics_file(os.path.join(METRICS_DIR, stem + ".json"))
+        if snap:
+            _merge_metrics(snap, counters, histograms)
+        folded.append(stem)
+    tmp_path = f"{METRICS_RETIRED_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"counters": [[n, dict(l), v] for (n, l), v in counters.items()],
+                   "histograms": [[n, dict(l), h["le"], h["counts"], h["sum"]] for (n, l), h in histograms.items()],
+                   "folded": folded}, f, separators=(",", ":"))
+    os.replace(tmp_path, METRICS_RETIRED_FILE)
+    for stem in stems:
+        for suffix in (".json", ".lock"):
             try:
-                ts = int(filename.replace('.txt', '').rsplit('_', 1)[-1])
-            except Exception:
-                ts = 0
-            if ts > best_ts:
-                best_ts = ts
-                best_path = filepath
-                best_name = filename
-    return best_path, best_name
+                os.remove(os.path.join(METRICS_DIR, stem + suffix))
+            except OSError:
+                pass
+
+def metrics_allowed():
+    """Whether the current request may scrape /metrics."""
+    if is_faculty():
+        return True
+    token = app.config["METRICS_TOKEN"]
+    if token and secrets.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return True
+    try:
+        addr = ipaddress.ip_address(request.remote_addr or "")
+    except ValueError:
+        return False
+    for entry in str(app.config["METRICS_ALLOW"]).split(","):
+        try:
+            if entry.strip() and addr in ipaddress.ip_network(entry.strip(), strict=False):
+                return True
+        except ValueError:
+            logger.error("Ignoring invalid METRICS_ALLOW entry %r", entry)
+    return False
+
+def _format_labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+def render_metrics():
+    """Merge every worker's snapshot into Prometheus text exposition format."""
+    flush_metrics()
+    counters, gauges, histograms = {}, {}, {}
+    try:
+        names = os.listdir(METRICS_DIR)
+    except OSError:
+        names = []
+    live, dead = [], []
+    with locked_file(METRICS_RETIRED_FILE):
+        for name in names:
+            match = re.match(r"(metrics-\d+(?:-\d+)?)\.json$", name)
+            if not match:
+                continue
+            stem = match.group(1)
+            if stem == _metrics["name"]:
+                live.append(stem)
+                continue
+            with open(os.path.join(METRICS_DIR, stem + ".lock"), "a+b") as lock:
+                (dead if _try_lock(lock) else live).append(stem)
+        if dead:
+            _retire_metrics(dead)
+        retired = _read_metrics_file(METRICS_RETIRED_FILE)
+    if retired:
+        _merge_metrics(retired, counters, histograms)
+    for stem in live:
+        snap = _read_metrics_file(os.path.join(METRICS_DIR, stem + ".json"))
+        if snap:
+            _merge_metrics(snap, counters, histograms, gauges)
+
+    lines = []
+    for metric, (kind, help_text) in METRIC_HELP.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        source = {"counter": counters, "gauge": gauges, "histogram": histograms}[kind]
+        for (n, labels), value in sorted(source.items(), key=lambda kv: kv[0]):
+            if n != metric:
+                continue
+            if kind != "histogram":
+                lines.append(f"{n}{_format_labels(labels)} {value}")
+                continue
+            running = 0
+            for bound, count in zip(value["le"] + ["+Inf"], value["counts"]):
+                running += count
+                lines.append(f"{n}_bucket{_format_labels(labels, le=bound)} {running}")
+            lines.append(f"{n}_sum{_format_labels(labels)} {value['sum']}")
+            lines.append(f"{n}_count{_format_labels(labels)} {running}")
+    return "\n".join(lines) + "\n"
+
+@app.before_request
+def _metrics_before_request():
+    _ensure_metrics_flusher()
+    g.metrics_start = time.perf_counter()
+    g.metrics_in_flight = True
+    metrics_gauge_add("spas_http_requests_in_flight", 1)
+
+@app.after_request
+def _metrics_after_request(response):
+    start = g.pop("metrics_start", None)
+    if start is not None:
+        endpoint = request.endpoint or "unmatched"
+        metrics_observe("spas_http_request_duration_seconds", time.perf_counter() - start,
+                        endpoint=endpoint, method=request.method)
+        metrics_inc("spas_http_requests_total", endpoint=endpoint, method=request.method,
+                    status=str(response.status_code))
+        if response.content_length is not None:
+            metrics_observe("spas_http_response_size_bytes", response.content_length, SIZE_BUCKETS,
+                            endpoint=endpoint)
+    return response
+
+@app.teardown_request
+def _metrics_teardown_request(exc):
+    # Teardown can run twice for a stream_with_context response; count the request out once.
+    if g.pop("metrics_in_flight", False):
+        metrics_gauge_add("spas_http_requests_in_flight", -1)
+
+def _timed_stream(chunks, fmt):
+    """Yield from chunks, recording the export duration once the stream is exhausted or closed."""
+    start = time.perf_counter()
+    try:
+        yield from chunks
+    finally:
+        metrics_observe("spas_export_duration_seconds", time.perf_counter() - start, format=fmt, cache="none")
+
+
+# ─────────────────────────── I/O Accounting ───────────────────────────────────
+#
+# Opt-in (IO_ACCOUNTING config or SPAS_IO_ACCOUNTING=1). An audit hook counts
+# every file open and directory listing made by the request thread; the data
+# helpers add bytes read and JSON parses/serialisations through _io_note().
+# Totals go out as a Server-Timing header and one JSON log line per request on
+# the "spas.io" logger. Work done by background threads is not attributed.
+
+app.config.setdefault("IO_ACCOUNTING", os.environ.get("SPAS_IO_ACCOUNTING") == "1")
+
+io_logger = logging.getLogger("spas.io")
+io_logger.setLevel(logging.INFO)
+
+_io_local = threading.local()
+_io_state = {"hooked": False}
+_io_hook_lock = threading.Lock()
+
+def _io_note(key, amount=1):
+    counters = getattr(_io_local, "counters", None)
+    if counters is not None:
+        counters[key] += amount
+
+def _io_audit_hook(event, args):
+    counters = getattr(_io_local, "counters", None)
+    if counters is None:
+        return
+    if event == "open":
+        counters["opens"] += 1
+    elif event in ("os.listdir", "os.scandir"):
+        counters["listdirs"] += 1
+
+@app.before_request
+def _io_before_request():
+    if not app.config["IO_ACCOUNTING"]:
+        return
+    if not _io_state["hooked"]:
+        with _io_hook_lock:   # two first requests must not install the hook twice
+            if not _io_state["hooked"]:
+                # audit hooks cannot be removed; the hook is a no-op outside accounted requests
+                sys.addaudithook(_io_audit_hook)
+                _io_state["hooked"] = True
+    _io_local.counters = {"opens": 0, "listdirs": 0, "bytes_read": 0, "json_loads": 0, "json_dumps": 0}
+    _io_local.start = time.perf_counter()
+
+@app.after_request
+def _io_after_request(response):
+    counters = getattr(_io_local, "counters", None)
+    if counters is None:
+        return response
+    elapsed_ms = (time.perf_counter() - _io_local.start) * 1000
+    response.headers.add("Server-Timing", ", ".join([
+        f"app;dur={elapsed_ms:.2f}",
+        f'open;desc="{counters["opens"]} files"',
+        f'read;desc="{counters["bytes_read"]} bytes"',
+        f'json;desc="{counters["json_loads"]} loads, {counters["json_dumps"]} dumps"',
+        f'listdir;desc="{counters["listdirs"]} dirs"',
+    ]))
+    io_logger.info(json.dumps(dict(
+        counters, method=request.method, path=request.path, endpoint=request.endpoint,
+        status=response.status_code, ms=round(elapsed_ms, 2))))
+    return response
+
+@app.teardown_request
+def _io_teardown_request(exc):
+    _io_local.counters = None
+
+
+# ─────────────────────────── Profiling ────────────────────────────────────────
+#
+# Opt-in (PROFILING config or SPAS_PROFILING=1). A logged-in faculty request
+# carrying "X-Profile: 1" or "?profile=1" runs under cProfile; the stats are
+# dumped to PROFILES_DIR as a pstats file (load it with pstats, snakeviz or
+# speedscope, or convert it for KCachegrind with pyprof2calltree) next to a
+# small JSON sidecar describing the request. Only the newest PROFILES_KEEP
+# profiles are kept.
+
+app.config.setdefault("PROFILING", os.environ.get("SPAS_PROFILING") == "1")
+PROFILES_DIR = os.path.join(DATA_DIR, "profiles")
+PROFILES_KEEP = 50
+
+def _profile_requested():
+    if not app.config["PROFILING"] or not is_faculty():
+        return False
+    return request.headers.get("X-Profile") == "1" or request.args.get("profile") == "1"
+
+def _prune_profiles():
+    try:
+        names = sorted(n for n in os.listdir(PROFILES_DIR) if n.endswith(".prof"))
+    except OSError:
+        return
+    for name in names[:-PROFILES_KEEP]:
+        for path in (os.path.join(PROFILES_DIR, name), os.path.join(PROFILES_DIR, name[:-5] + ".json")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def list_profiles():
+    """Saved profiles, newest first, with the request they were taken from."""
+    profiles = []
+    try:
+        names = sorted((n for n in os.listdir(PROFILES_DIR) if n.endswith(".prof")), reverse=True)
+    except OSError:
+        return profiles
+    for name in names:
+        try:
+            with open(os.path.join(PROFILES_DIR, name[:-5] + ".json"), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+        profiles.append(dict(meta, name=name))
+    return profiles
+
+@app.before_request
+def _profile_before_request():
+    if _profile_requested():
+        g.profiler = cProfile.Profile()
+        g.profile_start = time.perf_counter()
+        g.profiler.enable()
+
+@app.after_request
+def _profile_after_request(response):
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    try:
+        elapsed_ms = (time.perf_counter() - g.profile_start) * 1000
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        name = f"{stamp}-{request.endpoint or 'unmatched'}-{os.getpid()}"
+        profiler.dump_stats(os.path.join(PROFILES_DIR, name + ".prof"))
+        with open(os.path.join(PROFILES_DIR, name + ".json"), "w", encoding="utf-8") as f:
+            json.dump({"endpoint": request.endpoint, "method": request.method, "path": request.path,
+                       "query": request.query_string.decode("utf-8", "replace"), "faculty_id": session.get("faculty_id"),
+                       "status": response.status_code, "ms": round(elapsed_ms, 2),
+                       "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}, f)
+        _prune_profiles()
+        response.headers["X-Profile-Id"] = name + ".prof"
+    except Exception as e:
+        logger.error("Could not save profile: %s\n%s", e, traceback.format_exc())
+    return response
+
+
+# ─────────────────────────── Static Assets ────────────────────────────────────
+#
+# url_for("static", filename=...) emits a fingerprinted name such as
+# css/style.3f2a9c1b7d.css, which is served with a one-year immutable cache.
+# Text assets get .gz (and .br when the brotli package is installed) siblings
+# next to the original, picked per Accept-Encoding. Fingerprints and siblings
+# are refreshed whenever the source file's mtime or size changes, so no build
+# step is required; `flask build-static` does all of them up front for deploys.
+
+STATIC_DIR = app.static_folder
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".svg", ".json", ".txt", ".html")
+STATIC_IMMUTABLE = "public, max-age=31536000, immutable"
+
+_static_assets = {}   # filename -> {"stat": (mtime_ns, size), "hash": ..., "url": ...}
+_static_lock = threading.Lock()
+_FINGERPRINT_RE = re.compile(r"^(.+)\.([0-9a-f]{10})(\.[^./]+)$")
+
+def _precompress(path, data):
+    """Write path.gz (and path.br) atomically unless they are already newer than path."""
+    variants = [(".gz", lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", lambda d: brotli.compress(d, quality=11)))
+    src_mtime = os.stat(path).st_mtime_ns
+    for suffix, compress in variants:
+        target = path + suffix
+        try:
+            if os.stat(target).st_mtime_ns >= src_mtime:
+                continue
+        except OSError:
+            pass
+        tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compress(data))
+        os.replace(tmp_path, target)
+
+def static_asset(filename):
+    """Fingerprint entry for a static file (building its compressed siblings), or None if it does not exist."""
+    try:
+        path = safe_join(STATIC_DIR, filename)
+        st = os.stat(path) if path else None
+    except OSError:
+        st = None
+    if st is None or not os.path.isfile(path):
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    asset = _static_assets.get(filename)
+    if asset and asset["stat"] == key:
+        return asset
+    with _static_lock:
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha1(data).hexdigest()[:10]
+        stem, ext = os.path.splitext(filename)
+        if ext in COMPRESSIBLE_EXTENSIONS:
+            _precompress(path, data)
+        asset = _static_assets[filename] = {"stat": key, "hash": digest, "url": f"{stem}.{digest}{ext}"}
+        return asset
+
+def build_static_assets():
+    """Fingerprint and precompress every file under STATIC_DIR. Returns {filename: fingerprinted name}."""
+    built = {}
+    for root, _, files in os.walk(STATIC_DIR):
+        for name in files:
+            if name.endswith((".gz", ".br", ".tmp")):
+                continue
+            filename = os.path.relpath(os.path.join(root, name), STATIC_DIR).replace(os.sep, "/")
+            asset = static_asset(filename)
+            if asset:
+                built[filename] = asset["url"]
+    return built
+
+@app.url_defaults
+def _fingerprint_static_url(endpoint, values):
+    if endpoint == "static" and "filename" in values:
+        asset = static_asset(values["filename"])
+        if asset:
+            values["filename"] = asset["url"]
+
+def serve_static(filename):
+    """Replacement for Flask's static view: resolves fingerprints and serves precompressed variants."""
+    cache_control = "no-cache"
+    match = _FINGERPRINT_RE.match(filename)
+    if match and not static_asset(filename):
+        original = match.group(1) + match.group(3)
+        asset = static_asset(original)
+        if asset:
+            filename = original
+            # An outdated fingerprint still gets the current file, but must not be cached as immutable.
+            if asset["hash"] == match.group(2):
+                cache_control = STATIC_IMMUTABLE
+    path = safe_join(STATIC_DIR, filename)
+    if not path or not os.path.isfile(path):
+        raise NotFound()
+
+    encoding = None
+    if filename.endswith(COMPRESSIBLE_EXTENSIONS):
+        for candidate, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if request.accept_encodings[candidate] and os.path.isfile(path + suffix):
+                encoding, path = candidate, path + suffix
+                break
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+                         conditional=True)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    if filename.endswith(COMPRESSIBLE_EXTENSIONS):
+        response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+app.view_functions["static"] = serve_static
+
+
+# ─────────────────────────── Response Compression ─────────────────────────────
+#
+# gzip for HTML, JSON and text exports. Buffered responses are compressed when
+# they reach COMPRESS_MIN_BYTES; streamed responses (export_scores) are always
+# compressed on the fly since their size is unknown. Responses that already
+# carry a Content-Encoding (precompressed static files) and file downloads are
+# left alone. Compressed responses get a weak ETag, which If-None-Match still
+# matches, because their bytes differ from the identity encoding.
+
+app.config.setdefault("COMPRESS_MIN_BYTES", 1024)
+app.config.setdefault("COMPRESS_LEVEL", 6)
+app.config.setdefault("COMPRESS_MIMETYPES", ("text/html", "text/plain", "text/csv", "application/json",
+                                             "application/x-ndjson"))
+
+def _gzip_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)   # wbits 31: gzip container
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+@app.after_request
+def _compress_response(response):
+    if response.mimetype not in app.config["COMPRESS_MIMETYPES"] or response.direct_passthrough:
+        return response
+    response.vary.add("Accept-Encoding")
+    if (response.status_code < 200 or response.status_code in (204, 304) or request.method == "HEAD"
+            or "Content-Encoding" in response.headers or not request.accept_encodings["gzip"]):
+        return response
+
+    if response.is_streamed:
+        response.response = _gzip_stream(response.response, app.config["COMPRESS_LEVEL"])
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < app.config["COMPRESS_MIN_BYTES"]:
+            return response
+        response.set_data(gzip.compress(data, compresslevel=app.config["COMPRESS_LEVEL"]))
+    response.headers["Content-Encoding"] = "gzip"
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
 
 # ─────────────────────────── Routes ───────────────────────────────────────────
 
 @app.route("/", methods=["GET", "POST"])
 def index():
     try:
-        users = load_json(USERS_FILE)
-        faculty_data = load_json(FACULTY_FILE)
-
         if request.method == "POST":
             login_type = request.form.get("login_type")
             action = request.form.get("action")
 
             if login_type == "student":
+                users = load_json(USERS_FILE, readonly=action != "register")
                 if action == "login":
                     roll = request.form.get("roll_no", "").strip()
                     password = request.form.get("password", "").strip()
                     user = users.get(roll)
 
                     if user and user.get("password") == password:
+                        regenerate_session()
                         session["roll_no"] = roll
                         session["full_name"] = user.get("full_name", "")
                         session["branch"] = user.get("branch", "")
@@ -321,25 +2949,36 @@ def index():
                     elif roll in users:
                         flash("Roll number already exists.", "error")
                     else:
-                        users[roll] = {
-                            "roll_no": roll,
-                            "password": password,
-                            "full_name": full_name,
-                            "branch": branch,
-                            "year": year,
-                            "batch": batch,
-                            "email": email
-                        }
-                        save_json(USERS_FILE, users)
-                        flash("Profile created successfully. Now you can login.", "success")
+                        # Reload under the lock so a registration in another worker is not overwritten
+                        with locked_file(USERS_FILE):
+                            users = load_json(USERS_FILE)
+                            created = roll not in users
+                            if created:
+                                users[roll] = {
+                                    "roll_no": roll,
+                                    "password": password,
+                                    "full_name": full_name,
+                                    "branch": branch,
+                                    "year": year,
+                                    "batch": batch,
+                                    "email": email
+                                }
+                                save_json(USERS_FILE, users)
+                        if created:
+                            bump_data_version()
+                            flash("Profile created successfully. Now you can login.", "success")
+                        else:
+                            flash("Roll number already exists.", "error")
 
             elif login_type == "faculty":
+                faculty_data = load_json(FACULTY_FILE, readonly=action != "register")
                 if action == "login":
                     faculty_id = request.form.get("faculty_id", "").strip()
                     password = request.form.get("password", "").strip()
                     faculty = faculty_data.get(faculty_id)
 
                     if faculty and faculty.get("password") == password:
+                        regenerate_session()
                         session["faculty_id"] = faculty_id
                         session["full_name"] = faculty.get("full_name", "")
                         session["department"] = faculty.get("department", "")
@@ -362,15 +3001,22 @@ def index():
                     elif faculty_id in faculty_data:
                         flash("Faculty ID already exists.", "error")
                     else:
-                        faculty_data[faculty_id] = {
-                            "faculty_id": faculty_id,
-                            "password": password,
-                            "full_name": full_name,
-                            "department": department,
-                            "email": email
-                        }
-                        save_json(FACULTY_FILE, faculty_data)
-                        flash("Faculty profile created successfully. Now you can login.", "success")
+                        with locked_file(FACULTY_FILE):
+                            faculty_data = load_json(FACULTY_FILE)
+                            created = faculty_id not in faculty_data
+                            if created:
+                                faculty_data[faculty_id] = {
+                                    "faculty_id": faculty_id,
+                                    "password": password,
+                                    "full_name": full_name,
+                                    "department": department,
+                                    "email": email
+                                }
+                                save_json(FACULTY_FILE, faculty_data)
+                        if created:
+                            flash("Faculty profile created successfully. Now you can login.", "success")
+                        else:
+                            flash("Faculty ID already exists.", "error")
 
         return render_template("login.html")
     except Exception as e:
@@ -393,14 +3039,14 @@ def dashboard():
         return redirect(url_for("index"))
 
     try:
-        users = load_json(USERS_FILE)
+        users = load_json(USERS_FILE, readonly=True)
         user = users.get(session["roll_no"])
         if not user:
             session.clear()
             flash("User not found. Please login again.", "error")
             return redirect(url_for("index"))
 
-        subjects = load_json(SUBJECTS_FILE)
+        subjects = load_json(SUBJECTS_FILE, readonly=True)
         first_subject = subjects[0]['name'] if subjects else 'all'
         session_subject = session.get('selected_subject', first_subject)
         selected_subject = request.args.get('subject', session_subject)
@@ -410,7 +3056,7 @@ def dashboard():
         session['selected_subject'] = selected_subject
 
         if selected_subject == 'all':
-            practicals = load_json(PRACTICALS_FILE)
+            practicals = load_json(PRACTICALS_FILE, readonly=True)
         else:
             practicals = get_all_practicals_for_subject(selected_subject)
 
@@ -434,18 +3080,17 @@ def dashboard():
                 flash("No questions available for this practical. Please contact faculty.", "error")
                 return redirect(url_for("dashboard", subject=selected_subject))
 
-            random.shuffle(questions)
-            selected = questions[:20]
-
-            for key in ["last_result", "last_result_file", "exam_question_ids",
-                        "exam_questions", "exam_start_time", "exam_duration", "practical_name"]:
+            for key in ["last_result", "last_result_file", "exam_question_ids", "exam_questions",
+                        "exam_seed", "exam_snapshot", "exam_start_time", "exam_duration", "practical_name"]:
                 session.pop(key, None)
 
-            session["exam_question_ids"] = [int(q["id"]) for q in selected]
+            session["exam_seed"] = new_paper_seed()
+            session["exam_snapshot"] = paper_snapshot()
             session["exam_start_time"] = datetime.now().timestamp()
             session["exam_duration"] = EXAM_DURATION_SECONDS
             session["practical_name"] = practical_name
             session.modified = True
+            metrics_inc("spas_exams_started_total")
             return redirect(url_for("exam"))
 
         return render_template("dashboard.html", title="Dashboard", user=user, practicals=practicals,
@@ -463,11 +3108,11 @@ def faculty_dashboard():
         return redirect(url_for("index"))
 
     try:
-        faculty_data = load_json(FACULTY_FILE)
+        faculty_data = load_json(FACULTY_FILE, readonly=True)
         faculty = faculty_data.get(session["faculty_id"])
-        all_students = load_json(USERS_FILE)
-        practicals = load_json(PRACTICALS_FILE)
-        subjects = load_json(SUBJECTS_FILE)
+        all_students = load_json(USERS_FILE, readonly=True)
+        practicals = load_json(PRACTICALS_FILE, readonly=True)
+        subjects = load_json(SUBJECTS_FILE, readonly=True)
 
         selected_batch = request.args.get('batch', 'all')
         first_subject = subjects[0]['name'] if subjects else 'all'
@@ -483,107 +3128,12 @@ def faculty_dashboard():
 
         all_batches = sorted(set(s.get('batch', '1') for s in all_students.values()))
 
-        # Collect all results (latest per student+practical)
-        _raw_results = {}
-        if os.path.exists(RESULTS_DIR):
-            for filename in os.listdir(RESULTS_DIR):
-                if not filename.endswith('.txt'):
-                    continue
-                filepath = os.path.join(RESULTS_DIR, filename)
-                raw = read_file_safe(filepath)
-                if not raw:
-                    continue
-                result_dict = {}
-                for line in raw.split('\n'):
-                    if '==========' in line:
-                        break
-                    if ':' in line:
-                        _k, _v = line.split(':', 1)
-                        _k = _k.strip()
-                        if _k:
-                            result_dict[_k] = _v.strip()
-                practical_nm = result_dict.get('Practical', '').strip()
-                roll_nm = result_dict.get('Roll No', '').strip()
-                if not practical_nm or not roll_nm:
-                    continue
-                try:
-                    ts = int(filename.replace('.txt', '').rsplit('_', 1)[-1])
-                except Exception:
-                    ts = 0
-                dedup_key = (roll_nm, practical_nm)
-                if dedup_key not in _raw_results or ts > _raw_results[dedup_key][0]:
-                    _raw_results[dedup_key] = (ts, result_dict)
-
-        all_results = [v for _, v in _raw_results.values()]
-
-        # Student performance
-        student_performance = {}
-        for student_id, student_data in students.items():
-            student_results = [r for r in all_results if r.get("Roll No") == student_id]
-            practical_scores = {}
-            total_score = 0
-            count = 0
-
-            for result in student_results:
-                practical_name = result.get("Practical", "").strip()
-                if not practical_name:
-                    continue
-                practicals_stripped = [p.strip() for p in practicals]
-                if selected_subject != 'all' and practical_name not in practicals_stripped:
-                    continue
-                try:
-                    canonical = practicals[practicals_stripped.index(practical_name)]
-                except (ValueError, IndexError):
-                    canonical = practical_name
-
-                score_str = result.get("Score", "0 / 0")
-                if '/' in score_str:
-                    try:
-                        score = int(score_str.split('/')[0].strip())
-                    except (ValueError, TypeError):
-                        score = 0
-                    if canonical not in practical_scores:
-                        practical_scores[canonical] = score
-                        total_score += score
-                        count += 1
-
-            avg_score = round(total_score / count, 2) if count > 0 else 0
-            student_performance[student_id] = {
-                "name": student_data.get("full_name", ""),
-                "branch": student_data.get("branch", ""),
-                "year": student_data.get("year", ""),
-                "batch": student_data.get("batch", "1"),
-                "email": student_data.get("email", ""),
-                "practical_scores": practical_scores,
-                "total": total_score,
-                "average": avg_score,
-                "exams_taken": count
-            }
-
-        # Practical submissions
-        practical_submissions = {}
-        for practical_name in practicals:
-            submitted_students = []
-            pname_stripped = practical_name.strip()
-            seen_rolls = set()
-            for result in all_results:
-                if result.get("Practical", "").strip() == pname_stripped:
-                    roll_no = result.get("Roll No")
-                    if roll_no and roll_no in students and roll_no not in seen_rolls:
-                        student = students.get(roll_no)
-                        if student:
-                            submitted_students.append({
-                                'roll_no': roll_no,
-                                'name': student.get('full_name', ''),
-                                'batch': student.get('batch', '1')
-                            })
-                            seen_rolls.add(roll_no)
-            practical_submissions[practical_name] = submitted_students
+        # Table rows and submission lists are fetched page by page from /api/performance.
+        submission_counts = practical_submission_counts(students, practicals)
 
         return render_template("faculty_dashboard.html", title="Faculty Dashboard", faculty=faculty,
                                students=students, all_students=all_students, practicals=practicals,
-                               results=all_results, student_performance=student_performance,
-                               practical_submissions=practical_submissions, all_batches=all_batches,
+                               submission_counts=submission_counts, all_batches=all_batches,
                                selected_batch=selected_batch, subjects=subjects, selected_subject=selected_subject)
     except Exception as e:
         logger.error("faculty_dashboard error: %s\n%s", e, traceback.format_exc())
@@ -591,6 +3141,62 @@ def faculty_dashboard():
         return redirect(url_for("index"))
 
 
+@app.route("/api/performance")
+def performance_api():
+    """One page of the faculty performance table.
+
+    Query args: subject, batch, sort (roll_no, name, total, average or
+    practical:<name>), order (asc|desc), offset, limit (max 500) and optionally
+    submitted=<practical> to list only the students who submitted it.
+    """
+    if not is_faculty():
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+    try:
+        # Read before loading anything, so the ETag never names data newer than the page.
+        version = data_version()
+        all_students = load_json(USERS_FILE, readonly=True)
+        practicals = load_json(PRACTICALS_FILE, readonly=True)
+        selected_subject = request.args.get('subject', 'all')
+        selected_batch = request.args.get('batch', 'all')
+        if selected_subject != 'all':
+            practicals = get_all_practicals_for_subject(selected_subject)
+        if selected_batch != 'all':
+            students = {k: v for k, v in all_students.items() if v.get('batch', '1') == selected_batch}
+        else:
+            students = all_students
+
+        sort = request.args.get("sort", "roll_no")
+        order = request.args.get("order", "asc").lower()
+        submitted = request.args.get("submitted")
+        try:
+            offset = max(0, int(request.args.get("offset", 0)))
+            limit = min(500, max(1, int(request.args.get("limit", 50))))
+        except ValueError:
+            return jsonify({"success": False, "message": "offset and limit must be integers"}), 400
+        if sort not in ("roll_no", "name", "total", "average") and not (
+                sort.startswith("practical:") and sort.split(":", 1)[1] in practicals):
+            return jsonify({"success": False, "message": "Unknown sort: " + sort}), 400
+        if order not in ("asc", "desc"):
+            return jsonify({"success": False, "message": "order must be asc or desc"}), 400
+
+        def build():
+            total, page = performance_page(students, practicals, sort, order == "desc", offset, limit, submitted)
+            rows = [{
+                "roll_no": roll_no, "name": perf["name"], "branch": perf["branch"], "year": perf["year"],
+                "batch": perf["batch"], "scores": [perf["practical_scores"].get(p) for p in practicals],
+                "total": perf["total"], "average": perf["average"], "exams_taken": perf["exams_taken"],
+            } for roll_no, perf in page]
+            next_offset = offset + len(rows) if offset + len(rows) < total else None
+            return jsonify({"success": True, "total": total, "offset": offset, "limit": limit,
+                            "next_offset": next_offset, "practicals": list(practicals), "rows": rows})
+
+        # Every change that can alter the table bumps the data version.
+        return _conditional_response(("performance", version, request.query_string), "private, no-cache", build)
+    except Exception as e:
+        logger.error("performance_api error: %s\n%s", e, traceback.format_exc())
+        return jsonify({"success": False, "message": "Server error: " + str(e)}), 500
+
+
 @app.route("/api/add_subject", methods=["POST"])
 def add_subject():
     if not is_faculty():
@@ -602,21 +3208,24 @@ def add_subject():
         if not subject_name:
             return jsonify({"success": False, "message": "Subject name required"}), 400
 
-        subjects = load_json(SUBJECTS_FILE)
+        with locked_file(SUBJECTS_FILE):
+            subjects = load_json(SUBJECTS_FILE)
 
-        for subject in subjects:
-            if subject.get('name', '').lower() == subject_name.lower():
-                return jsonify({"success": False, "message": "Subject already exists"}), 400
+            for subject in subjects:
+                if subject.get('name', '').lower() == subject_name.lower():
+                    return jsonify({"success": False, "message": "Subject already exists"}), 400
 
-        # Safely generate new ID
-        try:
-            max_id = max(int(s['id']) for s in subjects if str(s.get('id', '')).isdigit())
-            new_id = str(max_id + 1)
-        except (ValueError, TypeError):
-            new_id = str(len(subjects) + 1)
+            # Safely generate new ID
+            try:
+                max_id = max(int(s['id']) for s in subjects if str(s.get('id', '')).isdigit())
+                new_id = str(max_id + 1)
+            except (ValueError, TypeError):
+                new_id = str(len(subjects) + 1)
 
-        subjects.append({"id": new_id, "name": subject_name, "practicals": []})
-        save_json(SUBJECTS_FILE, subjects)
+            subjects.append({"id": new_id, "name": subject_name, "practicals": []})
+            if not save_json(SUBJECTS_FILE, subjects):
+                raise IOError("Could not save subjects")
+        bump_data_version()
 
         return jsonify({"success": True, "subject": {"id": new_id, "name": subject_name}}), 200
     except Exception as e:
@@ -636,21 +3245,26 @@ def add_practical():
         if not practical_name:
             return jsonify({"success": False, "message": "Practical name required"}), 400
 
-        practicals = load_json(PRACTICALS_FILE)
+        # Practicals before subjects, in every writer, so two of them never deadlock.
+        with locked_file(PRACTICALS_FILE), locked_file(SUBJECTS_FILE):
+            practicals = load_json(PRACTICALS_FILE)
 
-        if practical_name in practicals:
-            return jsonify({"success": False, "message": "Practical already exists"}), 400
+            if practical_name in practicals:
+                return jsonify({"success": False, "message": "Practical already exists"}), 400
 
-        practicals = insert_practical_sorted(practicals, practical_name)
-        save_json(PRACTICALS_FILE, practicals)
+            practicals = insert_practical_sorted(practicals, practical_name)
+            if not save_json(PRACTICALS_FILE, practicals):
+                raise IOError("Could not save practicals")
 
-        subjects = load_json(SUBJECTS_FILE)
-        for subject in subjects:
-            if str(subject.get('id')) == subject_id:
-                if practical_name not in subject['practicals']:
-                    subject['practicals'] = insert_practical_sorted(subject['practicals'], practical_name)
-                break
-        save_json(SUBJECTS_FILE, subjects)
+            subjects = load_json(SUBJECTS_FILE)
+            for subject in subjects:
+                if str(subject.get('id')) == subject_id:
+                    if practical_name not in subject['practicals']:
+                        subject['practicals'] = insert_practical_sorted(subject['practicals'], practical_name)
+                    break
+            if not save_json(SUBJECTS_FILE, subjects):
+                raise IOError("Could not save subjects")
+        bump_data_version()
 
         return jsonify({"success": True, "practical": practical_name}), 200
     except Exception as e:
@@ -666,19 +3280,26 @@ def remove_practical():
         data = request.get_json(silent=True) or {}
         practical_name = data.get("name", "").strip()
 
-        practicals = load_json(PRACTICALS_FILE)
+        with locked_file(PRACTICALS_FILE), locked_file(SUBJECTS_FILE):
+            practicals = load_json(PRACTICALS_FILE)
 
-        if practical_name not in practicals:
-            return jsonify({"success": False, "message": "Practical not found"}), 404
+            if practical_name not in practicals:
+                return jsonify({"success": False, "message": "Practical not found"}), 404
 
-        practicals.remove(practical_name)
-        save_json(PRACTICALS_FILE, practicals)
+            practicals.remove(practical_name)
+            if not save_json(PRACTICALS_FILE, practicals):
+                raise IOError("Could not save practicals")
 
-        subjects = load_json(SUBJECTS_FILE)
-        for subject in subjects:
-            if practical_name in subject.get('practicals', []):
-                subject['practicals'].remove(practical_name)
-        save_json(SUBJECTS_FILE, subjects)
+            subjects = load_json(SUBJECTS_FILE)
+            for subject in subjects:
+                if practical_name in subject.get('practicals', []):
+                    subject['practicals'].remove(practical_name)
+            if not save_json(SUBJECTS_FILE, subjects):
+                raise IOError("Could not save subjects")
+
+        with _result_index_lock:
+            _matrix_sync_practicals()
+        bump_data_version()
 
         return jsonify({"success": True}), 200
     except Exception as e:
@@ -692,141 +3313,142 @@ def export_excel():
         return redirect(url_for("index"))
 
     try:
-        all_students = load_json(USERS_FILE)
-        practicals = load_json(PRACTICALS_FILE)
+        version = data_version()
+        all_students = load_json(USERS_FILE, readonly=True)
+        practicals = load_json(PRACTICALS_FILE, readonly=True)
         selected_subject = request.args.get('subject', 'all')
+        selected_batch = request.args.get('batch', 'all')
 
         if selected_subject != 'all':
             practicals = get_all_practicals_for_subject(selected_subject)
+        if selected_batch != 'all':
+            students = {k: v for k, v in all_students.items() if v.get('batch', '1') == selected_batch}
+        else:
+            students = all_students
 
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Student Performance"
-
-        header_font = Font(bold=True, color="FFFFFF", size=11)
-        header_fill = PatternFill(start_color="1976D2", end_color="1976D2", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center")
-        border = Border(
-            left=Side(style='thin'), right=Side(style='thin'),
-            top=Side(style='thin'), bottom=Side(style='thin')
-        )
-        center_align = Alignment(horizontal="center")
-        bold_font = Font(bold=True)
-
-        headers = ["Roll No", "Name", "Branch", "Year", "Batch"] + list(practicals) + ["Total", "Average"]
-
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = border
-
-        row = 2
-        for roll_no, student in all_students.items():
-            # Basic info
-            for col_idx, val in enumerate([
-                roll_no,
-                student.get("full_name", ""),
-                student.get("branch", ""),
-                student.get("year", ""),
-                student.get("batch", "1")
-            ], 1):
-                ws.cell(row=row, column=col_idx, value=val).border = border
-
-            student_results = get_student_results(roll_no)
-            scores_dict = {}
-            for result in student_results:
-                pname = result.get("Practical")
-                if pname and pname in practicals:
-                    score_str = result.get("Score", "0 / 0")
-                    if '/' in score_str:
-                        try:
-                            scores_dict[pname] = int(score_str.split('/')[0].strip())
-                        except (ValueError, TypeError):
-                            scores_dict[pname] = 0
-
-            col = 6
-            total = 0
-            count = 0
-            for practical in practicals:
-                score = scores_dict.get(practical)
-                if score is not None:
-                    cell = ws.cell(row=row, column=col, value=score)
-                    cell.alignment = center_align
-                    total += score
-                    count += 1
-                else:
-                    cell = ws.cell(row=row, column=col, value="-")
-                cell.border = border
-                col += 1
-
-            # Total
-            total_cell = ws.cell(row=row, column=col, value=total)
-            total_cell.border = border
-            total_cell.alignment = center_align
-            total_cell.font = bold_font
-
-            # Average
-            avg = round(total / count, 2) if count > 0 else 0
-            avg_cell = ws.cell(row=row, column=col + 1, value=avg)
-            avg_cell.border = border
-            avg_cell.alignment = center_align
-            avg_cell.font = bold_font
-
-            row += 1
-
-        # Auto column widths
-        for col in ws.columns:
-            max_length = 0
-            column_letter = col[0].column_letter
-            for cell in col:
-                try:
-                    if cell.value and len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except Exception:
-                    pass
-            ws.column_dimensions[column_letter].width = min(max_length + 2, 30)
-
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
+        started = time.perf_counter()
+        cache_path = _export_cache_path("xlsx", version, selected_subject, selected_batch)
+        workbook = _export_cache_get(cache_path)
+        if workbook:
+            cache_status = "HIT"
+        else:
+            workbook = _export_cache_put(cache_path, lambda f: _write_performance_workbook(f, students, practicals))
+            cache_status = "MISS"
+        metrics_inc("spas_export_cache_requests_total", result=cache_status.lower())
+        metrics_observe("spas_export_duration_seconds", time.perf_counter() - started,
+                        format="xlsx", cache=cache_status.lower())
 
         subject_suffix = f"_{selected_subject}" if selected_subject != 'all' else ""
         filename = f"student_performance{subject_suffix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
 
-        return send_file(
-            output,
+        response = send_file(
+            workbook,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             as_attachment=True,
             download_name=filename
         )
+        response.headers["X-Export-Cache"] = cache_status
+        return response
     except Exception as e:
         logger.error("export_excel error: %s\n%s", e, traceback.format_exc())
         flash(f"Error exporting to Excel: {str(e)}", "error")
         return redirect(url_for("faculty_dashboard"))
 
 
+@app.route("/export_scores")
+def export_scores():
+    """Stream the performance table as CSV or NDJSON.
+
+    Query args: format=csv|ndjson, subject, batch, and columns — a comma list of
+    roll_no, name, branch, year, batch, scores, total, average (default: all).
+    """
+    if not is_faculty():
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+    try:
+        fmt = request.args.get("format", "csv").lower()
+        if fmt not in ("csv", "ndjson"):
+            return jsonify({"success": False, "message": "format must be csv or ndjson"}), 400
+        columns = [c.strip() for c in request.args.get("columns", "").split(",") if c.strip()]
+        columns = columns or list(EXPORT_COLUMNS)
+        unknown = [c for c in columns if c not in EXPORT_COLUMNS]
+        if unknown:
+            return jsonify({"success": False, "message": "Unknown column(s): " + ", ".join(unknown)}), 400
+
+        all_students = load_json(USERS_FILE, readonly=True)
+        practicals = load_json(PRACTICALS_FILE, readonly=True)
+        selected_subject = request.args.get('subject', 'all')
+        selected_batch = request.args.get('batch', 'all')
+        if selected_subject != 'all':
+            practicals = get_all_practicals_for_subject(selected_subject)
+        if selected_batch != 'all':
+            students = {k: v for k, v in all_students.items() if v.get('batch', '1') == selected_batch}
+        else:
+            students = all_students
+
+        def fields(roll_no, perf):
+            values = {"roll_no": roll_no, "name": perf["name"], "branch": perf["branch"], "year": perf["year"],
+                      "batch": perf["batch"], "total": perf["total"], "average": perf["average"]}
+            return [(c, values[c]) if c != "scores" else
+                    (c, {p: perf["practical_scores"].get(p) for p in practicals}) for c in columns]
+
+        def generate_csv():
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            header = []
+            for c in columns:
+                header.extend(practicals if c == "scores" else [c])
+            writer.writerow(header)
+            yield buf.getvalue()
+            for roll_no, perf in iter_student_performance(students, practicals):
+                buf.seek(0)
+                buf.truncate()
+                row = []
+                for c, value in fields(roll_no, perf):
+                    row.extend(("" if v is None else v for v in value.values()) if c == "scores" else [value])
+                writer.writerow(row)
+                yield buf.getvalue()
+
+        def generate_ndjson():
+            for roll_no, perf in iter_student_performance(students, practicals):
+                yield json.dumps(dict(fields(roll_no, perf)), ensure_ascii=False) + "\n"
+
+        subject_suffix = f"_{selected_subject}" if selected_subject != 'all' else ""
+        filename = f"student_performance{subject_suffix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+        mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+        rows = generate_csv() if fmt == "csv" else generate_ndjson()
+        response = Response(stream_with_context(_timed_stream(rows, fmt)), mimetype=mimetype)
+        set_attachment(response, filename)
+        return response
+    except Exception as e:
+        logger.error("export_scores error: %s\n%s", e, traceback.format_exc())
+        return jsonify({"success": False, "message": "Server error: " + str(e)}), 500
+
+
 @app.route("/delete_account", methods=["POST"])
 def delete_account():
     try:
         if is_student():
             roll_no = session["roll_no"]
-            users = load_json(USERS_FILE)
-            if roll_no in users:
-                del users[roll_no]
-                save_json(USERS_FILE, users)
+            with locked_file(USERS_FILE):
+                users = load_json(USERS_FILE)
+                if roll_no in users:
+                    del users[roll_no]
+                    save_json(USERS_FILE, users, removed=[roll_no])
             delete_user_results(roll_no)
+            bump_data_version()
             session.clear()
             flash("Your account has been deleted successfully.", "success")
             return redirect(url_for("index"))
 
         elif is_faculty():
             faculty_id = session["faculty_id"]
-            faculty = load_json(FACULTY_FILE)
-            if faculty_id in faculty:
-                del faculty[faculty_id]
-                save_json(FACULTY_FILE, faculty)
+            with locked_file(FACULTY_FILE):
+                faculty = load_json(FACULTY_FILE)
+                deleted = faculty.pop(faculty_id, None) is not None
+                if deleted:
+                    save_json(FACULTY_FILE, faculty, removed=[faculty_id])
+            if deleted:
+                bump_data_version()
             session.clear()
             flash("Your account has been deleted successfully.", "success")
             return redirect(url_for("index"))
@@ -843,7 +3465,6 @@ def update_profile():
     if not is_student():
         return redirect(url_for("index"))
     try:
-        users = load_json(USERS_FILE)
         roll_no = session["roll_no"]
 
         full_name = request.form.get("full_name", "").strip()
@@ -852,16 +3473,21 @@ def update_profile():
         batch = request.form.get("batch", "1")
         email = request.form.get("email", "").strip()
 
-        if roll_no in users:
-            users[roll_no].update({
-                "full_name": full_name, "branch": branch,
-                "year": year, "batch": batch, "email": email
-            })
+        with locked_file(USERS_FILE):
+            users = load_json(USERS_FILE)
+            updated = roll_no in users
+            if updated:
+                users[roll_no].update({
+                    "full_name": full_name, "branch": branch,
+                    "year": year, "batch": batch, "email": email
+                })
+                save_json(USERS_FILE, users)
+        if updated:
             session.update({
                 "full_name": full_name, "branch": branch,
                 "year": year, "batch": batch, "email": email
             })
-            save_json(USERS_FILE, users)
+            bump_data_version()
             flash("Profile updated successfully!", "success")
     except Exception as e:
         logger.error("update_profile error: %s", e)
@@ -875,21 +3501,25 @@ def faculty_update_profile():
     if not is_faculty():
         return redirect(url_for("index"))
     try:
-        faculty_data = load_json(FACULTY_FILE)
         faculty_id = session["faculty_id"]
 
         full_name = request.form.get("full_name", "").strip()
         department = request.form.get("department", "")
         email = request.form.get("email", "").strip()
 
-        if faculty_id in faculty_data:
-            faculty_data[faculty_id].update({
-                "full_name": full_name, "department": department, "email": email
-            })
+        with locked_file(FACULTY_FILE):
+            faculty_data = load_json(FACULTY_FILE)
+            updated = faculty_id in faculty_data
+            if updated:
+                faculty_data[faculty_id].update({
+                    "full_name": full_name, "department": department, "email": email
+                })
+                save_json(FACULTY_FILE, faculty_data)
+        if updated:
             session.update({
                 "full_name": full_name, "department": department, "email": email
             })
-            save_json(FACULTY_FILE, faculty_data)
+            bump_data_version()
             flash("Profile updated successfully!", "success")
     except Exception as e:
         logger.error("faculty_update_profile error: %s", e)
@@ -904,43 +3534,37 @@ def exam():
         return redirect(url_for("index"))
 
     try:
-        if "exam_question_ids" not in session:
+        if "exam_seed" not in session:
             flash("No active exam found. Please start from the dashboard.", "error")
             return redirect(url_for("dashboard"))
 
-        question_ids = session.get("exam_question_ids", [])
-        if not question_ids:
-            flash("Exam question list is empty. Please start again.", "error")
-            return redirect(url_for("dashboard"))
-
-        questions = get_questions_by_ids(question_ids)
-        if not questions:
-            flash("Could not load exam questions. Please start again from the dashboard.", "error")
-            # Clear stale exam session data
-            for key in ["exam_question_ids", "exam_start_time", "exam_duration", "practical_name"]:
-                session.pop(key, None)
-            return redirect(url_for("dashboard"))
-
         start_time = session.get("exam_start_time")
         if not start_time:
             flash("Exam session expired. Please start again.", "error")
             return redirect(url_for("dashboard"))
 
-        duration = session.get("exam_duration", EXAM_DURATION_SECONDS)
-        now_ts = datetime.now().timestamp()
-        remaining = int(start_time + duration - now_ts)
-
-        # If time is up, auto-submit with no answers (GET submit)
-        if remaining <= 0:
-            return redirect(url_for("submit_exam"))
-
         practical_name = session.get("practical_name", "")
         if not practical_name:
             flash("Exam session data missing. Please start again.", "error")
             return redirect(url_for("dashboard"))
 
-        return render_template("exam.html", questions=questions,
-                               remaining=remaining, practical_name=practical_name)
+        duration = session.get("exam_duration", EXAM_DURATION_SECONDS)
+        bundle = exam_bundle(session["roll_no"], practical_name, session["exam_seed"],
+                             session.get("exam_snapshot", 0), start_time, duration)
+        if not bundle["questions"]:
+            flash("Could not load exam questions. Please start again from the dashboard.", "error")
+            # Clear stale exam session data
+            for key in ["exam_seed", "exam_snapshot", "exam_start_time", "exam_duration", "practical_name"]:
+                session.pop(key, None)
+            return redirect(url_for("dashboard"))
+
+        # If time is up, auto-submit with no answers (GET submit)
+        if bundle["remaining"] <= 0:
+            return redirect(url_for("submit_exam"))
+
+        # The page carries the bundle inline, so taking the exam is this request plus the submit
+        return render_template("exam.html", questions=bundle["questions"], remaining=bundle["remaining"],
+                               practical_name=practical_name, bundle=bundle)
     except Exception as e:
         logger.error("exam route error: %s\n%s", e, traceback.format_exc())
         flash(f"Error loading exam: {str(e)}", "error")
@@ -954,21 +3578,19 @@ def submit_exam():
 
     try:
         # ── Guard: must have an active exam ────────────────────────────────────
-        if "exam_question_ids" not in session:
+        if "exam_seed" not in session:
             flash("No active exam to submit. Please start from the dashboard.", "error")
             return redirect(url_for("dashboard"))
 
-        question_ids = session.get("exam_question_ids", [])
-        if not question_ids:
-            flash("Exam session is empty. Please start again.", "error")
-            return redirect(url_for("dashboard"))
-
-        # ── Load questions from file (never from session) ───────────────────────
-        questions = get_questions_by_ids(question_ids)
+        # ── Regenerate the paper from its seed (never from session) ─────────────
+        paper_seed, paper_snapshot_id = session["exam_seed"], session.get("exam_snapshot", 0)
+        questions = generate_paper(session.get("practical_name", ""), session.get("roll_no", ""),
+                                   paper_seed, paper_snapshot_id)
         if not questions:
-            logger.error("submit_exam: get_questions_by_ids returned empty for ids=%s", question_ids)
+            logger.error("submit_exam: empty paper for practical=%r seed=%s snapshot=%s",
+                         session.get("practical_name"), paper_seed, paper_snapshot_id)
             flash("Could not load exam questions. Please contact faculty.", "error")
-            for key in ["exam_question_ids", "exam_start_time", "exam_duration", "practical_name"]:
+            for key in ["exam_seed", "exam_snapshot", "exam_start_time", "exam_duration", "practical_name"]:
                 session.pop(key, None)
             return redirect(url_for("dashboard"))
 
@@ -992,35 +3614,8 @@ def submit_exam():
         if not practical_name:
             logger.warning("submit_exam: practical_name is empty for roll=%s", session.get("roll_no"))
 
-        # ── Score calculation ───────────────────────────────────────────────────
-        total     = len(questions)
-        correct   = 0
-        attempted = 0
-        detailed_answers = []
-
-        for q in questions:
-            qid        = str(q.get("id", ""))
-            ans        = submitted_answers.get(qid)
-            q_answer   = q.get("answer", "")
-            is_correct = bool(ans and ans == q_answer)
-
-            if ans:
-                attempted += 1
-                if is_correct:
-                    correct += 1
-
-            detailed_answers.append({
-                "question":       q.get("question", ""),
-                "options":        q.get("options", {}),
-                "student_answer": ans if ans else "NOT ATTEMPTED",
-                "correct_answer": q_answer,
-                "status":         "CORRECT" if is_correct else ("WRONG" if ans else "NOT ATTEMPTED")
-            })
-
-        wrong = total - correct
-
         # ── Load user data ──────────────────────────────────────────────────────
-        users = load_json(USERS_FILE)
+        users = load_json(USERS_FILE, readonly=True)
         roll_no = session.get("roll_no", "")
         user    = users.get(roll_no)
 
@@ -1030,69 +3625,23 @@ def submit_exam():
             session.clear()
             return redirect(url_for("index"))
 
-        dt_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # ── Write result file ───────────────────────────────────────────────────
-        os.makedirs(RESULTS_DIR, exist_ok=True)
-        filename = f"Result_RollNo_{user['roll_no']}_{int(datetime.now().timestamp())}.txt"
-        filepath = os.path.join(RESULTS_DIR, filename)
-
-        lines = [
-            f"Roll No: {user.get('roll_no', '')}",
-            f"Name: {user.get('full_name', '')}",
-            f"Branch: {user.get('branch', '')}",
-            f"Year: {user.get('year', '')}",
-            f"Batch: {user.get('batch', '1')}",
-            f"Email: {user.get('email', '')}",
-            f"Practical: {practical_name}",
-            f"Score: {correct} / {total}",
-            f"Attempted: {attempted}",
-            f"Correct: {correct}",
-            f"Wrong: {wrong}",
-            f"Date & Time: {dt_str}",
-            "",
-            "========== QUESTION WISE RESULT =========="
-        ]
-
-        for q_no, item in enumerate(detailed_answers, 1):
-            lines.append("")
-            lines.append(f"Q{q_no}. {item['question']}")
-            options = item.get("options", {})
-            for key in ["A", "B", "C", "D"]:
-                lines.append(f"   {key}) {options.get(key, '')}")
-            lines.append(f"Your Answer   : {item['student_answer']}")
-            lines.append(f"Correct Answer: {item['correct_answer']}")
-            lines.append(f"Status        : {item['status']}")
-            lines.append("-" * 50)
-
-        # Write result file — raise on failure so we catch it
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write("\n".join(lines))
-
-        logger.info("Result saved: %s | Score: %d/%d", filename, correct, total)
+        # ── Score and write result record ───────────────────────────────────────
+        record = grade_paper(user, practical_name, questions, submitted_answers, paper_seed, paper_snapshot_id,
+                             request.form.get("telemetry"))
+        filename = exam_result_filename(user["roll_no"], session.get("exam_start_time") or time.time())
+
+        # Journal the result — raise on failure so we catch it
+        enqueue_submission(filename, record)
+        metrics_inc("spas_submissions_total")
+        logger.info("Result saved: %s | Score: %s", filename, record["score"])
 
         # ── Store compact summary in session (no detailed_answers to stay small) ─
-        session["last_result"] = {
-            "roll_no":         user.get("roll_no", ""),
-            "name":            user.get("full_name", ""),
-            "branch":          user.get("branch", ""),
-            "year":            user.get("year", ""),
-            "batch":           user.get("batch", "1"),
-            "email":           user.get("email", ""),
-            "practical_name":  practical_name,
-            "score":           f"{correct} / {total}",
-            "total_questions": total,
-            "attempted":       attempted,
-            "correct":         correct,
-            "wrong":           wrong,
-            "datetime":        dt_str,
-            "detailed_answers": []   # loaded from file by /result
-        }
+        session["last_result"] = dict(record, detailed_answers=[])   # loaded from the record by /result
         session["last_result_file"] = filename
         session.modified = True
 
         # ── Clear exam session keys ─────────────────────────────────────────────
-        for key in ["exam_question_ids", "exam_start_time", "exam_duration", "practical_name"]:
+        for key in ["exam_seed", "exam_snapshot", "exam_start_time", "exam_duration", "practical_name"]:
             session.pop(key, None)
 
         return redirect(url_for("result"))
@@ -1104,6 +3653,109 @@ def submit_exam():
         return redirect(url_for("dashboard"))
 
 
+@app.route("/api/exam/bundle")
+def api_exam_bundle():
+    """The active exam as JSON: questions, remaining seconds and the submission token."""
+    if not is_student():
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    try:
+        if "exam_seed" not in session or not session.get("exam_start_time"):
+            return jsonify({"success": False, "message": "No active exam."}), 404
+        bundle = exam_bundle(session["roll_no"], session.get("practical_name", ""), session["exam_seed"],
+                             session.get("exam_snapshot", 0), session["exam_start_time"],
+                             session.get("exam_duration", EXAM_DURATION_SECONDS))
+        response = jsonify(dict(bundle, success=True))
+        response.headers["Cache-Control"] = "no-store"
+        return response
+    except Exception as e:
+        logger.error("api_exam_bundle error: %s\n%s", e, traceback.format_exc())
+        return jsonify({"success": False, "message": "Could not load the exam."}), 500
+
+
+@app.route("/api/exam/submit", methods=["POST"])
+def api_exam_submit():
+    """Submit {"token": ..., "answers": {question id: option}, "telemetry": {event: count}}.
+
+    Repeating a submit returns the same result.
+    """
+    if not is_student():
+        return jsonify({"success": False, "message": "Your session has ended. Please log in again; "
+                                                    "your answers are kept on this device."}), 401
+
+    try:
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            return jsonify({"success": False, "message": "Expected a JSON object."}), 400
+        exam_info = read_exam_token(payload.get("token"))
+        if not exam_info or exam_info["roll_no"] != session.get("roll_no"):
+            return jsonify({"success": False, "message": "Invalid submission token."}), 400
+        answers = payload.get("answers") or {}
+        if not isinstance(answers, dict):
+            return jsonify({"success": False, "message": "Answers must be an object."}), 400
+
+        roll_no, practical_name = exam_info["roll_no"], exam_info["practical_name"]
+        _, existing = _find_result_file(roll_no, practical_name)
+        if existing:
+            record = load_result_record(existing)
+            if record and record.get("paper_seed") == exam_info["seed"]:
+                return jsonify({"success": True, "duplicate": True,
+                                "result_url": url_for("view_result", practical_name=practical_name)})
+            return jsonify({"success": False, "message": "You have already submitted this practical."}), 409
+
+        deadline = exam_info["start_time"] + exam_info["duration"] + app.config["EXAM_SUBMIT_GRACE_SECONDS"]
+        if time.time() > deadline:
+            return jsonify({"success": False, "message": "The submission window for this exam has closed."}), 403
+
+        questions = generate_paper(practical_name, roll_no, exam_info["seed"], exam_info["snapshot"])
+        user = load_json(USERS_FILE, readonly=True).get(roll_no)
+        if not questions or not user:
+            # The practical or the account is gone; retrying cannot help, so this is not a 5xx.
+            logger.error("api_exam_submit: no paper or user for roll=%s practical=%r", roll_no, practical_name)
+            return jsonify({"success": False, "message": "Could not load exam questions. Please contact faculty."}), 409
+
+        submitted_answers = {str(qid): ans for qid, ans in answers.items() if isinstance(ans, str) and ans}
+        record = grade_paper(user, practical_name, questions, submitted_answers,
+                             exam_info["seed"], exam_info["snapshot"], payload.get("telemetry"))
+        filename = exam_result_filename(roll_no, exam_info["start_time"])
+        enqueue_submission(filename, record)
+        metrics_inc("spas_submissions_total")
+        logger.info("Result saved: %s | Score: %s", filename, record["score"])
+
+        session["last_result"] = dict(record, detailed_answers=[])
+        session["last_result_file"] = filename
+        if session.get("exam_seed") == exam_info["seed"]:
+            for key in ["exam_seed", "exam_snapshot", "exam_start_time", "exam_duration", "practical_name"]:
+                session.pop(key, None)
+        return jsonify({"success": True, "duplicate": False, "result_url": url_for("result")})
+    except Exception as e:
+        logger.error("api_exam_submit FAILED: %s\n%s", e, traceback.format_exc())
+        return jsonify({"success": False, "message": "Submission failed. Retrying..."}), 500
+
+
+@app.route("/api/telemetry", methods=["POST"])
+def api_telemetry():
+    """Accept a sendBeacon batch {"token": ..., "events": [{"type": ..., "at": ms}, ...]}."""
+    if not is_student():
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    try:
+        payload = request.get_json(force=True, silent=True)
+        if not isinstance(payload, dict):
+            return jsonify({"success": False, "message": "Expected a JSON object."}), 400
+        exam_info = read_exam_token(payload.get("token"))
+        if not exam_info or exam_info["roll_no"] != session.get("roll_no"):
+            return jsonify({"success": False, "message": "Invalid exam token."}), 400
+        events = payload.get("events")
+        if not isinstance(events, list):
+            return jsonify({"success": False, "message": "Events must be a list."}), 400
+        record_telemetry(exam_info, events)
+        return "", 204
+    except Exception as e:
+        logger.error("api_telemetry error: %s", e)
+        return jsonify({"success": False, "message": "Server error"}), 500
+
+
 @app.route("/result")
 def result():
     try:
@@ -1115,10 +3767,9 @@ def result():
             return redirect(url_for("dashboard"))
 
         if not result_data.get("detailed_answers") and filename:
-            filepath = os.path.join(RESULTS_DIR, filename)
-            if os.path.exists(filepath):
-                parsed = parse_result_file(filepath)
-                result_data["detailed_answers"] = parsed.get("detailed_answers", [])
+            record = load_result_record(filename)
+            if record:
+                result_data["detailed_answers"] = record.get("detailed_answers", [])
 
         return render_template("result.html", result=result_data, filename=filename)
     except Exception as e:
@@ -1133,29 +3784,13 @@ def view_result(practical_name):
         return redirect(url_for("index"))
 
     try:
-        filepath, filename = _find_result_file(session['roll_no'], practical_name)
+        _, filename = _find_result_file(session['roll_no'], practical_name)
+        result_data = load_result_record(filename) if filename else None
 
-        if not filepath:
+        if not result_data:
             flash("Result not found.", "error")
             return redirect(url_for("dashboard"))
 
-        parsed_result = parse_result_file(filepath)
-        result_data = {
-            "roll_no": parsed_result.get("Roll No"),
-            "name": parsed_result.get("Name"),
-            "branch": parsed_result.get("Branch"),
-            "year": parsed_result.get("Year"),
-            "batch": parsed_result.get("Batch", "1"),
-            "email": parsed_result.get("Email"),
-            "practical_name": parsed_result.get("Practical"),
-            "score": parsed_result.get("Score"),
-            "attempted": parsed_result.get("Attempted"),
-            "correct": parsed_result.get("Correct"),
-            "wrong": parsed_result.get("Wrong"),
-            "datetime": parsed_result.get("Date & Time"),
-            "detailed_answers": parsed_result.get("detailed_answers", [])
-        }
-
         return render_template("result.html", result=result_data, filename=filename)
     except Exception as e:
         logger.error("view_result error: %s\n%s", e, traceback.format_exc())
@@ -1166,7 +3801,14 @@ def view_result(practical_name):
 @app.route("/download/<path:filename>")
 def download(filename):
     try:
-        return send_from_directory(RESULTS_DIR, filename, as_attachment=True)
+        if os.path.exists(safe_join(RESULTS_DIR, filename) or ""):
+            return send_from_directory(RESULTS_DIR, filename, as_attachment=True)
+        record_path = safe_join(RESULTS_DIR, os.path.splitext(filename)[0] + ".json")
+        if not filename.endswith(".txt") or not record_path or not os.path.exists(record_path):
+            raise NotFound()
+        report = render_result_report(_read_result_record(record_path) or {})
+        return send_file(io.BytesIO(report.encode("utf-8")), mimetype="text/plain",
+                         as_attachment=True, download_name=os.path.basename(filename))
     except Exception as e:
         logger.error("download error: %s", e)
         flash("File not found.", "error")
@@ -1186,29 +3828,13 @@ def faculty_view_result(roll_no, practical_name):
         return redirect(url_for("index"))
 
     try:
-        filepath, _ = _find_result_file(roll_no, practical_name)
+        _, filename = _find_result_file(roll_no, practical_name)
+        result_data = load_result_record(filename) if filename else None
 
-        if not filepath:
+        if not result_data:
             flash("Result not found.", "error")
             return redirect(url_for("faculty_dashboard"))
 
-        parsed_result = parse_result_file(filepath)
-        result_data = {
-            "roll_no": parsed_result.get("Roll No"),
-            "name": parsed_result.get("Name"),
-            "branch": parsed_result.get("Branch"),
-            "year": parsed_result.get("Year"),
-            "batch": parsed_result.get("Batch", "1"),
-            "email": parsed_result.get("Email"),
-            "practical_name": parsed_result.get("Practical"),
-            "score": parsed_result.get("Score"),
-            "attempted": parsed_result.get("Attempted"),
-            "correct": parsed_result.get("Correct"),
-            "wrong": parsed_result.get("Wrong"),
-            "datetime": parsed_result.get("Date & Time"),
-            "detailed_answers": parsed_result.get("detailed_answers", [])
-        }
-
         return render_template("result.html", result=result_data, filename=None, is_faculty_view=True)
     except Exception as e:
         logger.error("faculty_view_result error: %s\n%s", e, traceback.format_exc())
@@ -1222,27 +3848,17 @@ def get_result_data(roll_no, practical_name):
         return jsonify({"success": False, "message": "Unauthorized"}), 401
 
     try:
-        filepath, _ = _find_result_file(roll_no, practical_name)
-        if not filepath:
+        _, filename = _find_result_file(roll_no, practical_name)
+        if not filename:
             return jsonify({"success": False, "message": "Result not found"}), 404
 
-        parsed = parse_result_file(filepath)
-        result_data = {
-            "roll_no":          parsed.get("Roll No"),
-            "name":             parsed.get("Name"),
-            "branch":           parsed.get("Branch"),
-            "year":             parsed.get("Year"),
-            "batch":            parsed.get("Batch", "1"),
-            "email":            parsed.get("Email"),
-            "practical_name":   parsed.get("Practical"),
-            "score":            parsed.get("Score"),
-            "attempted":        parsed.get("Attempted"),
-            "correct":          parsed.get("Correct"),
-            "wrong":            parsed.get("Wrong"),
-            "datetime":         parsed.get("Date & Time"),
-            "detailed_answers": parsed.get("detailed_answers", [])
-        }
-        return jsonify({"success": True, "result": result_data})
+        def build():
+            result_data = load_result_record(filename)
+            if not result_data:
+                return jsonify({"success": False, "message": "Result not found"}), 404
+            return jsonify({"success": True, "result": result_data})
+
+        return _conditional_response(("result-data", filename), RESULT_CACHE_CONTROL, build)
     except Exception as e:
         logger.error("get_result_data error: %s", e)
         return jsonify({"success": False, "message": "Server error: " + str(e)}), 500
@@ -1254,15 +3870,17 @@ def get_result_txt(roll_no, practical_name):
         return jsonify({"success": False, "message": "Unauthorized"}), 401
 
     try:
-        filepath, filename = _find_result_file(roll_no, practical_name)
-        if not filepath:
+        _, filename = _find_result_file(roll_no, practical_name)
+        if not filename:
             return jsonify({"success": False, "message": "File not found"}), 404
 
-        file_content = read_file_safe(filepath)
-        if file_content is None:
-            return jsonify({"success": False, "message": "Could not read file"}), 500
+        def build():
+            file_content = read_result_report(filename)
+            if file_content is None:
+                return jsonify({"success": False, "message": "Could not read file"}), 500
+            return jsonify({"success": True, "content": file_content, "filename": filename})
 
-        return jsonify({"success": True, "content": file_content, "filename": filename})
+        return _conditional_response(("result-txt", filename), RESULT_CACHE_CONTROL, build)
     except Exception as e:
         logger.error("get_result_txt error: %s", e)
         return jsonify({"success": False, "message": "Server error: " + str(e)}), 500
@@ -1276,9 +3894,14 @@ def get_questions():
         practical_name = request.args.get("practical", "").strip()
         if not practical_name:
             return jsonify({"success": False, "message": "Practical name required"}), 400
-        questions = load_json(QUESTIONS_FILE)
-        practical_questions = [q for q in questions if q.get("practical") == practical_name]
-        return jsonify({"success": True, "questions": practical_questions, "count": len(practical_questions)})
+
+        def build():
+            practical_questions = get_practical_questions(practical_name)
+            return jsonify({"success": True, "questions": practical_questions, "count": len(practical_questions)})
+
+        # Faculty edit questions from the same modal, so always revalidate.
+        return _conditional_response(("questions", practical_name, _json_source_key(QUESTIONS_FILE)),
+                                     "private, no-cache", build)
     except Exception as e:
         logger.error("get_questions error: %s", e)
         return jsonify({"success": False, "message": "Server error: " + str(e)}), 500
@@ -1304,33 +3927,102 @@ def add_question():
         if answer not in ["A", "B", "C", "D"]:
             return jsonify({"success": False, "message": "Correct answer must be A, B, C or D"}), 400
 
-        questions = load_json(QUESTIONS_FILE)
-        existing = [q for q in questions if q.get("practical") == practical_name]
-        if len(existing) >= 20:
-            return jsonify({"success": False, "message": "Maximum 20 questions allowed per practical"}), 400
+        # The cap is checked against the list reloaded under the lock, so two
+        # workers adding the last slot cannot both succeed.
+        with locked_file(QUESTIONS_FILE):
+            questions = load_json(QUESTIONS_FILE)
+            existing = sum(1 for q in questions if q.get("practical") == practical_name)
+            if existing >= QUESTIONS_PER_PRACTICAL:
+                return jsonify({"success": False, "message": "Maximum 20 questions allowed per practical"}), 400
+
+            new_question = {
+                "id": allocate_question_ids(1)[0],
+                "practical": practical_name,
+                "question": question_text,
+                "options": {
+                    "A": str(options.get("A", "")).strip(),
+                    "B": str(options.get("B", "")).strip(),
+                    "C": str(options.get("C", "")).strip(),
+                    "D": str(options.get("D", "")).strip()
+                },
+                "answer": answer
+            }
+            questions.append(new_question)
+            if not save_json(QUESTIONS_FILE, questions):
+                raise IOError("Could not save questions")
+        return jsonify({"success": True, "question": new_question, "total": existing + 1}), 200
+    except Exception as e:
+        logger.error("add_question error: %s\n%s", e, traceback.format_exc())
+        return jsonify({"success": False, "message": "Server error: " + str(e)}), 500
 
+
+@app.route("/api/import_questions", methods=["POST"])
+def import_questions_api():
+    """Bulk import from an uploaded CSV/JSON/XLSX file ("file") or a JSON body {"questions": [...]}.
+
+    Every row is validated first; nothing is saved unless all rows are valid.
+    Pass dry_run=1 to only validate.
+    """
+    if not is_faculty():
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+    try:
+        upload = request.files.get("file")
+        dry_run = request.values.get("dry_run", "").lower() in ("1", "true", "yes")
         try:
-            new_id = max((int(q.get("id", 0)) for q in questions), default=0) + 1
-        except (ValueError, TypeError):
-            new_id = len(questions) + 1
-
-        new_question = {
-            "id": new_id,
-            "practical": practical_name,
-            "question": question_text,
-            "options": {
-                "A": str(options.get("A", "")).strip(),
-                "B": str(options.get("B", "")).strip(),
-                "C": str(options.get("C", "")).strip(),
-                "D": str(options.get("D", "")).strip()
-            },
-            "answer": answer
-        }
-        questions.append(new_question)
-        save_json(QUESTIONS_FILE, questions)
-        return jsonify({"success": True, "question": new_question, "total": len(existing) + 1}), 200
+            if upload:
+                fmt = (request.values.get("format") or os.path.splitext(upload.filename or "")[1].lstrip(".")).lower()
+                rows = read_question_rows(upload.read(), fmt)
+            else:
+                payload = request.get_json(silent=True)
+                if payload is None:
+                    return jsonify({"success": False, "message": "Upload a file or send JSON"}), 400
+                dry_run = dry_run or bool(isinstance(payload, dict) and payload.get("dry_run"))
+                rows = read_question_rows(json.dumps(payload), "json")
+        except (ValueError, KeyError, zipfile.BadZipFile) as e:
+            return jsonify({"success": False, "message": f"Could not read file: {e}"}), 400
+
+        added, errors = import_questions(rows, dry_run=dry_run)
+        if errors:
+            return jsonify({"success": False, "message": f"{len(errors)} row(s) have errors; nothing was imported",
+                            "errors": errors}), 400
+        return jsonify({"success": True, "dry_run": dry_run, "imported": sum(added.values()),
+                        "by_practical": added}), 200
     except Exception as e:
-        logger.error("add_question error: %s\n%s", e, traceback.format_exc())
+        logger.error("import_questions error: %s\n%s", e, traceback.format_exc())
+        return jsonify({"success": False, "message": "Server error: " + str(e)}), 500
+
+
+@app.route("/api/import_roster", methods=["POST"])
+def import_roster_api():
+    """Create or update students from an uploaded roster ("file": CSV/XLSX/JSON).
+
+    Form fields: dry_run=1 to only report, batches=N to spread new students
+    without a batch over N batches, update_existing=0 to reject known roll numbers.
+    """
+    if not is_faculty():
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+    try:
+        upload = request.files.get("file")
+        if not upload:
+            return jsonify({"success": False, "message": "Roster file required"}), 400
+        dry_run = request.values.get("dry_run", "").lower() in ("1", "true", "yes")
+        update_existing = request.values.get("update_existing", "1").lower() not in ("0", "false", "no")
+        batches = request.values.get("batches", "").strip()
+        if batches and not (batches.isdigit() and int(batches) > 0):
+            return jsonify({"success": False, "message": "batches must be a positive number"}), 400
+        try:
+            fmt = (request.values.get("format") or os.path.splitext(upload.filename or "")[1].lstrip(".")).lower()
+            rows = read_roster_rows(upload.read(), fmt)
+        except (ValueError, KeyError, zipfile.BadZipFile) as e:
+            return jsonify({"success": False, "message": f"Could not read file: {e}"}), 400
+
+        report = import_roster(rows, int(batches) if batches else None, update_existing, dry_run)
+        if report["errors"]:
+            return jsonify(dict(report, success=False, dry_run=dry_run,
+                                message=f"{len(report['errors'])} row(s) have errors; nothing was imported")), 400
+        return jsonify(dict(report, success=True, dry_run=dry_run)), 200
+    except Exception as e:
+        logger.error("import_roster error: %s\n%s", e, traceback.format_exc())
         return jsonify({"success": False, "message": "Server error: " + str(e)}), 500
 
 
@@ -1343,19 +4035,131 @@ def delete_question():
         question_id = data.get("id")
         if question_id is None:
             return jsonify({"success": False, "message": "Question ID required"}), 400
-        questions = load_json(QUESTIONS_FILE)
-        original_len = len(questions)
-        questions = [q for q in questions if q.get("id") != question_id]
-        if len(questions) == original_len:
-            return jsonify({"success": False, "message": "Question not found"}), 404
-        save_json(QUESTIONS_FILE, questions)
+        with locked_file(QUESTIONS_FILE):
+            questions = load_json(QUESTIONS_FILE)
+            original_len = len(questions)
+            questions = [q for q in questions if q.get("id") != question_id]
+            if len(questions) == original_len:
+                return jsonify({"success": False, "message": "Question not found"}), 404
+            _question_id_counter()   # the deleted id may be the highest; keep the counter past it
+            save_json(QUESTIONS_FILE, questions)
         return jsonify({"success": True}), 200
     except Exception as e:
         logger.error("delete_question error: %s", e)
         return jsonify({"success": False, "message": "Server error: " + str(e)}), 500
 
 
+@app.route("/faculty/profiles")
+def faculty_profiles():
+    if not is_faculty():
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+    try:
+        return jsonify({"success": True, "enabled": app.config["PROFILING"], "profiles": list_profiles()}), 200
+    except Exception as e:
+        logger.error("faculty_profiles error: %s", e)
+        return jsonify({"success": False, "message": "Server error: " + str(e)}), 500
+
+
+@app.route("/faculty/profiles/<name>")
+def faculty_profile_download(name):
+    if not is_faculty():
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+    if not name.endswith(".prof"):
+        return jsonify({"success": False, "message": "Profile not found"}), 404
+    return send_from_directory(PROFILES_DIR, name, as_attachment=True, mimetype="application/octet-stream")
+
+
+@app.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint covering every worker that shares METRICS_DIR."""
+    if not metrics_allowed():
+        return Response("# forbidden\n", status=403, mimetype="text/plain")
+    try:
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+    except Exception as e:
+        logger.error("metrics error: %s\n%s", e, traceback.format_exc())
+        return Response("# metrics unavailable\n", status=500, mimetype="text/plain")
+
+
+@app.cli.command("rebuild-index")
+def rebuild_index_command():
+    """Rebuild the result index from the files in data/results."""
+    count = rebuild_result_index()
+    print(f"Indexed {count} result file(s).")
+
+
+@app.cli.command("build-static")
+def build_static_command():
+    """Fingerprint static assets and write their precompressed variants."""
+    for filename, url in sorted(build_static_assets().items()):
+        print(f"{filename} -> {url}")
+
+
+@app.cli.command("import-questions")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "json", "xlsx"]), help="defaults to the file extension")
+@click.option("--dry-run", is_flag=True, help="validate only")
+def import_questions_command(path, fmt, dry_run):
+    """Import questions for any number of practicals from a CSV, JSON or XLSX file."""
+    with open(path, "rb") as f:
+        try:
+            rows = read_question_rows(f.read(), fmt or os.path.splitext(path)[1].lstrip(".").lower())
+        except (ValueError, KeyError, zipfile.BadZipFile) as e:
+            raise click.ClickException(f"Could not read {path}: {e}")
+    added, errors = import_questions(rows, dry_run=dry_run)
+    for error in errors:
+        print(f"row {error['row']}: {error['message']}")
+    if errors:
+        raise click.ClickException(f"{len(errors)} row(s) have errors; nothing was imported.")
+    for practical, count in sorted(added.items()):
+        print(f"{practical}: {count} question(s)")
+    print(f"{'Would import' if dry_run else 'Imported'} {sum(added.values())} question(s).")
+
+
+@app.cli.command("import-roster")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "json", "xlsx"]), help="defaults to the file extension")
+@click.option("--batches", type=click.IntRange(min=1), help="spread new students without a batch over N batches")
+@click.option("--no-update", is_flag=True, help="reject roll numbers that already exist")
+@click.option("--dry-run", is_flag=True, help="report what would change without saving")
+def import_roster_command(path, fmt, batches, no_update, dry_run):
+    """Create or update students from a CSV, XLSX or JSON roster."""
+    with open(path, "rb") as f:
+        try:
+            rows = read_roster_rows(f.read(), fmt or os.path.splitext(path)[1].lstrip(".").lower())
+        except (ValueError, KeyError, zipfile.BadZipFile) as e:
+            raise click.ClickException(f"Could not read {path}: {e}")
+    report = import_roster(rows, batches, not no_update, dry_run)
+    for error in report["errors"]:
+        print(f"row {error['row']}: {error['message']}")
+    if report["errors"]:
+        raise click.ClickException(f"{len(report['errors'])} row(s) have errors; nothing was imported.")
+    for entry in report["created"]:
+        print(f"create {entry['roll_no']} (batch {entry['batch']}, password {entry['password']})")
+    for entry in report["updated"]:
+        print(f"update {entry['roll_no']}: {', '.join(entry['fields'])}")
+    print(f"{'Would create' if dry_run else 'Created'} {len(report['created'])}, "
+          f"{'update' if dry_run else 'updated'} {len(report['updated'])}, unchanged {report['unchanged']}.")
+
+
+@app.cli.command("migrate-sqlite")
+def migrate_sqlite_command():
+    """Import the JSON data files and result files into the SQLite database."""
+    counts = migrate_to_sqlite()
+    for table, count in counts.items():
+        print(f"{table}: {count} row(s)")
+    print(f"Done. Start the app with SPAS_STORAGE=sqlite to use {SQLITE_FILE}.")
+
+
+# Submissions journaled by workers that died are written out as soon as the app
+# is loaded; forked workers replay again when they serve their first request.
+try:
+    replay_submission_journals()
+except Exception as e:
+    logger.error("Could not replay submission journals: %s\n%s", e, traceback.format_exc())
+
 if __name__ == "__main__":
     os.makedirs(DATA_DIR, exist_ok=True)
     os.makedirs(RESULTS_DIR, exist_ok=True)
+    rebuild_result_index()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,128 @@
+"""Generate a synthetic SPAS data directory for load tests and benchmarks.
+
+    python bench/datagen.py /tmp/spas-data --students 2000 --practicals 20 --results 20000
+
+Writes users.json, faculty.json, subjects.json, practicals.json, questions.json
+(20 questions per practical) and result reports in the legacy
+Result_RollNo_<roll>_<ts>.txt format that the app converts on first read.
+"""
+import argparse, json, os, random, sys
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FACULTY_ID = "900001"
+FACULTY_PASSWORD = "faculty-pass"
+QUESTIONS_PER_PRACTICAL = 20
+
+
+def student_password(roll_no):
+    return f"pass-{roll_no}"
+
+
+def _dump(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+
+
+def generate(data_dir, students=1000, practicals=20, results=5000, batches=5, subjects=2, seed=0):
+    """Fill data_dir with synthetic data. Returns a summary dict with the credentials used."""
+    sys.path.insert(0, REPO_DIR)
+    from app import render_result_report
+
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(data_dir, "results"), exist_ok=True)
+
+    users = {}
+    for i in range(students):
+        roll_no = str(24000000 + i)
+        users[roll_no] = {
+            "roll_no": roll_no,
+            "password": student_password(roll_no),
+            "full_name": f"Student {i:05d}",
+            "branch": rng.choice(["IT", "CM", "ECE", "ME", "Civil"]),
+            "year": rng.choice(["1st", "2nd", "3rd"]),
+            "batch": str(i % batches + 1),
+            "email": f"student{i}@example.com",
+        }
+    _dump(os.path.join(data_dir, "users.json"), users)
+    _dump(os.path.join(data_dir, "faculty.json"), {FACULTY_ID: {
+        "faculty_id": FACULTY_ID, "password": FACULTY_PASSWORD, "full_name": "Load Test Faculty",
+        "department": "IT", "email": "faculty@example.com",
+    }})
+
+    practical_names = [f"Practical No: {i} Synthetic practical {i}" for i in range(1, practicals + 1)]
+    _dump(os.path.join(data_dir, "practicals.json"), practical_names)
+    _dump(os.path.join(data_dir, "subjects.json"), [
+        {"id": str(s + 1), "name": f"SUBJECT{s + 1}", "practicals": practical_names[s::subjects]}
+        for s in range(subjects)
+    ])
+
+    questions, by_practical, next_id = [], {}, 1
+    for practical in practical_names:
+        for n in range(QUESTIONS_PER_PRACTICAL):
+            q = {
+                "id": next_id,
+                "practical": practical,
+                "question": f"Synthetic question {n + 1} for {practical}?",
+                "options": {k: f"Option {k} of question {next_id}" for k in "ABCD"},
+                "answer": rng.choice("ABCD"),
+            }
+            questions.append(q)
+            by_practical.setdefault(practical, []).append(q)
+            next_id += 1
+    _dump(os.path.join(data_dir, "questions.json"), questions)
+
+    rolls = list(users)
+    base_ts = 1_700_000_000
+    for i in range(results):
+        user = users[rng.choice(rolls)]
+        practical = rng.choice(practical_names)
+        answers, correct, attempted = [], 0, 0
+        for q in by_practical[practical]:
+            ans = rng.choice("ABCD") if rng.random() < 0.9 else None
+            ok = ans == q["answer"]
+            attempted += bool(ans)
+            correct += ok
+            answers.append({
+                "question": q["question"], "options": q["options"],
+                "student_answer": ans or "NOT ATTEMPTED", "correct_answer": q["answer"],
+                "status": "CORRECT" if ok else ("WRONG" if ans else "NOT ATTEMPTED"),
+            })
+        total = len(answers)
+        ts = base_ts + i
+        record = {
+            "roll_no": user["roll_no"], "name": user["full_name"], "branch": user["branch"],
+            "year": user["year"], "batch": user["batch"], "email": user["email"],
+            "practical_name": practical, "score": f"{correct} / {total}",
+            "attempted": attempted, "correct": correct, "wrong": total - correct,
+            "datetime": datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S"),
+            "detailed_answers": answers,
+        }
+        path = os.path.join(data_dir, "results", f"Result_RollNo_{user['roll_no']}_{ts}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(render_result_report(record))
+
+    return {
+        "data_dir": data_dir, "students": students, "practicals": practicals, "results": results,
+        "questions": len(questions), "faculty_id": FACULTY_ID, "faculty_password": FACULTY_PASSWORD,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("data_dir")
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--practicals", type=int, default=20)
+    parser.add_argument("--results", type=int, default=5000)
+    parser.add_argument("--batches", type=int, default=5)
+    parser.add_argument("--subjects", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    summary = generate(args.data_dir, args.students, args.practicals, args.results,
+                       args.batches, args.subjects, args.seed)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
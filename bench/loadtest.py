@@ -0,0 +1,262 @@
+"""Replay realistic SPAS sessions against the app and report per-route latency.
+
+    # In-process through Flask's test client on a fresh synthetic data set
+    python bench/loadtest.py --students 1000 --results 10000 --sessions 200 --concurrency 8 --out run.json
+
+    # Against gunicorn started locally on the same synthetic data
+    python bench/loadtest.py --gunicorn --workers 4 --concurrency 32 --out run.json
+
+    # Against a server that is already running on an existing data directory
+    python bench/loadtest.py --url http://127.0.0.1:5000 --data-dir /tmp/spas-data
+
+Each student session logs in, opens the dashboard, starts an exam, loads /exam,
+submits random answers and opens /result. A share of sessions are faculty
+sessions that open the faculty dashboard and download the Excel export. The
+JSON report has p50/p95/p99 latency, error counts and throughput per route.
+"""
+import argparse, http.cookiejar, json, os, random, re, shutil, socket, subprocess, sys
+import tempfile, threading, time, urllib.error, urllib.parse, urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import datagen
+
+REPO_DIR = datagen.REPO_DIR
+
+
+class TestClientSession:
+    """Requests through Flask's test client inside this process."""
+
+    def __init__(self, app, headers):
+        self.client = app.test_client()
+        self.headers = headers
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data, headers=self.headers)
+        return response.status_code, response.get_data()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    """Requests over HTTP with a cookie jar; redirects are not followed so each hop is timed on its own."""
+
+    def __init__(self, base_url, headers):
+        self.base_url = base_url.rstrip("/")
+        self.headers = headers
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect)
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method, headers=self.headers)
+        try:
+            with self.opener.open(req, timeout=120) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+        self.bytes = {}
+
+    def timed(self, session, label, method, path, data=None):
+        start = time.perf_counter()
+        try:
+            status, body = session.request(method, path, data)
+        except Exception:
+            status, body = 599, b""
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.samples.setdefault(label, []).append(elapsed)
+            self.bytes[label] = self.bytes.get(label, 0) + len(body)
+            if status >= 400:
+                self.errors[label] = self.errors.get(label, 0) + 1
+        return status, body
+
+    def fail(self, label):
+        """Count a flow step that answered but did not do what the session expected (e.g. a failed login)."""
+        with self.lock:
+            self.errors[label] = self.errors.get(label, 0) + 1
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def student_session(session, rec, roll_no, practicals):
+    rec.timed(session, "GET /", "GET", "/")
+    status, _ = rec.timed(session, "POST / (login)", "POST", "/", {
+        "login_type": "student", "action": "login", "roll_no": roll_no,
+        "password": datagen.student_password(roll_no)})
+    if status != 302:
+        rec.fail("POST / (login)")
+        return
+    rec.timed(session, "GET /dashboard", "GET", "/dashboard?subject=all")
+    status, _ = rec.timed(session, "POST /dashboard (start exam)", "POST", "/dashboard?subject=all",
+                          {"practical_name": random.choice(practicals)})
+    if status != 302:
+        rec.fail("POST /dashboard (start exam)")
+        return
+    status, body = rec.timed(session, "GET /exam", "GET", "/exam")
+    html = body.decode("utf-8", "replace")
+    form = {name: random.choice("ABCD") for name in set(re.findall(r'name="(answer_\d+)"', html))}
+    for name, value in re.findall(r'<input type="hidden" name="([^"]+)" value="([^"]*)"', html):
+        form.setdefault(name, value)
+    rec.timed(session, "POST /submit_exam", "POST", "/submit_exam", form)
+    rec.timed(session, "GET /result", "GET", "/result")
+
+
+def faculty_session(session, rec, subjects):
+    rec.timed(session, "POST / (faculty login)", "POST", "/", {
+        "login_type": "faculty", "action": "login", "faculty_id": datagen.FACULTY_ID,
+        "password": datagen.FACULTY_PASSWORD})
+    subject = urllib.parse.quote(random.choice(subjects))
+    rec.timed(session, "GET /faculty_dashboard", "GET", f"/faculty_dashboard?subject={subject}&batch=all")
+    rec.timed(session, "GET /export_excel", "GET", f"/export_excel?subject={subject}")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(data_dir, workers, threads):
+    port = _free_port()
+    env = dict(os.environ, SPAS_DATA_DIR=data_dir)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "--threads", str(threads),
+         "-b", f"127.0.0.1:{port}", "app:app"],
+        cwd=REPO_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url + "/", timeout=1).read()
+            return proc, url
+        except Exception:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("gunicorn did not start")
+
+
+def run(args):
+    cleanup = None
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="spas-load-")
+    # app reads SPAS_DATA_DIR at import time, and datagen imports it to render reports
+    os.environ["SPAS_DATA_DIR"] = data_dir
+    if not args.data_dir:
+        cleanup = data_dir
+        datagen.generate(data_dir, args.students, args.practicals, args.results, seed=args.seed)
+
+    with open(os.path.join(data_dir, "users.json"), encoding="utf-8") as f:
+        rolls = list(json.load(f))
+    with open(os.path.join(data_dir, "practicals.json"), encoding="utf-8") as f:
+        practicals = json.load(f)
+    with open(os.path.join(data_dir, "subjects.json"), encoding="utf-8") as f:
+        subjects = [s["name"] for s in json.load(f)] + ["all"]
+
+    # Bodies are timed and counted as received; with --gzip that is the compressed size.
+    headers = {"Accept-Encoding": "gzip"} if args.gzip else {}
+    proc = None
+    if args.url:
+        target, make_session = args.url, (lambda: HttpSession(args.url, headers))
+    elif args.gunicorn:
+        proc, url = start_gunicorn(data_dir, args.workers, args.threads)
+        target, make_session = f"gunicorn x{args.workers} {url}", (lambda: HttpSession(url, headers))
+    else:
+        sys.path.insert(0, REPO_DIR)
+        import app as app_module
+        target, make_session = "flask test client", (lambda: TestClientSession(app_module.app, headers))
+
+    random.seed(args.seed)
+    students = random.sample(rolls, min(args.sessions, len(rolls)))
+    faculty_every = int(1 / args.faculty_share) if args.faculty_share > 0 else 0
+    rec = Recorder()
+
+    def one(i):
+        session = make_session()
+        if faculty_every and i % faculty_every == 0:
+            faculty_session(session, rec, subjects)
+        else:
+            student_session(session, rec, students[i % len(students)], practicals)
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(one, range(args.sessions)))
+    finally:
+        wall = time.perf_counter() - started
+        if proc:
+            proc.terminate()
+            proc.wait()
+        if cleanup and not args.keep_data:
+            shutil.rmtree(cleanup, ignore_errors=True)
+
+    routes = {}
+    for label, values in sorted(rec.samples.items()):
+        values.sort()
+        routes[label] = {
+            "count": len(values),
+            "errors": rec.errors.get(label, 0),
+            "p50_ms": round(_percentile(values, 50) * 1000, 2),
+            "p95_ms": round(_percentile(values, 95) * 1000, 2),
+            "p99_ms": round(_percentile(values, 99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2),
+            "mean_bytes": round(rec.bytes.get(label, 0) / len(values)),
+            "throughput_rps": round(len(values) / wall, 2),
+        }
+    return {
+        "target": target,
+        "config": {k: v for k, v in vars(args).items() if k not in ("out",)},
+        "wall_seconds": round(wall, 3),
+        "requests": sum(r["count"] for r in routes.values()),
+        "routes": routes,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", help="use an existing data directory instead of generating one")
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--practicals", type=int, default=20)
+    parser.add_argument("--results", type=int, default=5000)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--faculty-share", type=float, default=0.05,
+                        help="fraction of sessions that are faculty sessions")
+    parser.add_argument("--gunicorn", action="store_true", help="start gunicorn locally and drive it over HTTP")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--url", help="drive an already running server")
+    parser.add_argument("--gzip", action="store_true", help="send Accept-Encoding: gzip")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-data", action="store_true")
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(f"{'route':32} {'count':>6} {'err':>4} {'p50':>9} {'p95':>9} {'p99':>9} {'rps':>8} {'bytes':>9}")
+    for label, r in report["routes"].items():
+        print(f"{label:32} {r['count']:6} {r['errors']:4} {r['p50_ms']:9} {r['p95_ms']:9} {r['p99_ms']:9} "
+              f"{r['throughput_rps']:8} {r['mean_bytes']:9}")
+    print(f"{report['requests']} requests in {report['wall_seconds']}s against {report['target']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Micro-benchmarks for the data-layer helpers at several data sizes.
+
+    # Measure and store a baseline
+    python bench/microbench.py --sizes 1000,10000 --save bench/baseline.json
+
+    # Measure again and fail (exit 1) if any case is more than 25% slower
+    python bench/microbench.py --sizes 1000,10000 --compare bench/baseline.json --threshold 0.25
+
+A size is the number of result files; the data set has size/5 students and
+--practicals practicals. Each size runs in its own subprocess on freshly
+generated data (app reads SPAS_DATA_DIR at import time). Every case is timed
+with timeit's autorange and reported as min and median microseconds per call.
+The faculty_dashboard_page cases render the whole page through the test client
+with and without gzip, so their difference is the compression overhead. A case
+name always measures the same work; a changed measurement gets a new name, and
+--compare lists baseline cases that are no longer measured as retired.
+"""
+import argparse, gzip, io, json, os, random, shutil, statistics, subprocess, sys, tempfile, timeit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import datagen
+
+REPEAT = 5
+
+
+def _time(func):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    runs = [t / number * 1e6 for t in timer.repeat(repeat=REPEAT, number=number)]
+    return {"min_us": round(min(runs), 2), "median_us": round(statistics.median(runs), 2), "loops": number}
+
+
+def run_size(size, practicals, seed):
+    """Generate data for one size and time every case in this process."""
+    data_dir = tempfile.mkdtemp(prefix="spas-bench-")
+    os.environ["SPAS_DATA_DIR"] = data_dir
+    try:
+        datagen.generate(data_dir, students=max(1, size // 5), practicals=practicals, results=size, seed=seed)
+        sys.path.insert(0, datagen.REPO_DIR)
+        import app as A
+
+        rng = random.Random(seed)
+        students = A.load_json(A.USERS_FILE, readonly=True)
+        practical_names = A.load_json(A.PRACTICALS_FILE, readonly=True)
+        A.rebuild_result_index()
+        with_results = [r for r in students if A.get_student_results(r)] or list(students)
+        roll = rng.choice(with_results)
+        practical = next((h["Practical"] for h in A.get_student_results(roll)), practical_names[0])
+        legacy_txt = os.path.join(A.RESULTS_DIR, sorted(f for f in os.listdir(A.RESULTS_DIR) if f.endswith(".txt"))[0])
+        question_ids = [q["id"] for q in A.get_practical_questions(practical_names[0])]
+        many_practicals = [f"Practical No: {i} Bench practical" for i in range(1, 201)]
+
+        client = A.app.test_client()
+        client.post("/", data={"login_type": "faculty", "action": "login", "faculty_id": datagen.FACULTY_ID,
+                               "password": datagen.FACULTY_PASSWORD})
+        dashboard_url = "/faculty_dashboard?subject=all&batch=all"
+        dashboard_html = client.get(dashboard_url).get_data()
+
+        def load_json_cold():
+            A._json_cache.pop(A.USERS_FILE, None)
+            A.load_json(A.USERS_FILE, readonly=True)
+
+        def insert_sorted():
+            A.insert_practical_sorted(list(many_practicals), "Practical No: 150 New practical")
+
+        cases = {
+            "load_json_cold": load_json_cold,
+            "load_json_readonly": lambda: A.load_json(A.USERS_FILE, readonly=True),
+            "load_json_copy": lambda: A.load_json(A.USERS_FILE),
+            "get_student_results": lambda: A.get_student_results(roll),
+            "_find_result_file": lambda: A._find_result_file(roll, practical),
+            "parse_result_file": lambda: A.parse_result_file(legacy_txt),
+            "get_questions_by_ids": lambda: A.get_questions_by_ids(question_ids),
+            "generate_paper": lambda: A.generate_paper(practical_names[0], roll, 12345, A.paper_snapshot()),
+            "extract_practical_number": lambda: A.extract_practical_number("Practical No: 17 Something"),
+            "insert_practical_sorted": insert_sorted,
+            # Whole score table for every student, the work the dashboard did before it paginated;
+            # kept under its original name so older baselines still compare like for like.
+            "faculty_dashboard_aggregation": lambda: list(A.iter_student_performance(students, practical_names)),
+            "practical_submission_counts": lambda: A.practical_submission_counts(students, practical_names),
+            "performance_page_by_total": lambda: A.performance_page(students, practical_names, "total", True),
+            "export_excel_build": lambda: A._write_performance_workbook(io.BytesIO(), students, practical_names),
+            "faculty_dashboard_page": lambda: client.get(dashboard_url).get_data(),
+            "faculty_dashboard_page_gzip": lambda: client.get(dashboard_url, headers={"Accept-Encoding": "gzip"}).get_data(),
+            "gzip_dashboard_html": lambda: gzip.compress(dashboard_html, compresslevel=A.app.config["COMPRESS_LEVEL"]),
+        }
+        return {name: _time(func) for name, func in cases.items()}
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def measure(sizes, practicals, seed):
+    """Run every size in a fresh interpreter and merge the results into {"case[size]": timing}."""
+    results = {}
+    for size in sizes:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", str(size),
+             "--practicals", str(practicals), "--seed", str(seed)],
+            capture_output=True, text=True)
+        if proc.returncode:
+            sys.stderr.write(proc.stderr)
+            raise SystemExit(f"benchmark worker for size {size} failed")
+        for name, timing in json.loads(proc.stdout.strip().splitlines()[-1]).items():
+            results[f"{name}[{size}]"] = timing
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return rows (case, baseline us, current us, ratio, regressed) for cases present in both runs,
+    and the baseline cases this run no longer measures."""
+    rows = []
+    for case, timing in results.items():
+        base = baseline.get(case)
+        if not base:
+            continue
+        ratio = timing["median_us"] / base["median_us"] if base["median_us"] else 1.0
+        rows.append((case, base["median_us"], timing["median_us"], ratio, ratio > 1 + threshold))
+    return rows, sorted(case for case in baseline if case not in results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,5000", help="comma-separated result counts")
+    parser.add_argument("--practicals", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the results to this baseline file")
+    parser.add_argument("--compare", help="compare against this baseline file")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown of the median before a case counts as a regression")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker is not None:
+        print(json.dumps(run_size(args.worker, args.practicals, args.seed)))
+        return 0
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = measure(sizes, args.practicals, args.seed)
+
+    print(f"{'case':44} {'min_us':>12} {'median_us':>12}")
+    for case, timing in results.items():
+        print(f"{case:44} {timing['min_us']:12} {timing['median_us']:12}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "sizes": sizes, "results": results}, f, indent=2)
+        print(f"baseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        rows, retired = compare(results, baseline, args.threshold)
+        regressions = [r for r in rows if r[4]]
+        print(f"\n{'case':44} {'baseline':>12} {'current':>12} {'ratio':>7}")
+        for case, base, current, ratio, regressed in rows:
+            print(f"{case:44} {base:12} {current:12} {ratio:7.2f}{'  REGRESSION' if regressed else ''}")
+        for case in retired:
+            print(f"{case:44} {baseline[case]['median_us']:12} {'retired':>12}")
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}")
+            return 1
+        print(f"\nno regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,9 @@
 let remainingSeconds = 0;
 let timerInterval = null;
 let tabSwitchCount = 0;
+let telemetryQueue = [];
+let telemetryTimer = null;
+let telemetryTotals = {};   // running counts per event, sent with the submit
 
 // Timer functions
 function startTimer(seconds) {
@@ -24,11 +27,52 @@ function updateTimerDisplay() {
     timerDiv.textContent = "Time Left: " + min + "m " + (sec < 10 ? "0" + sec : sec) + "s";
 }
 
+// Proctoring telemetry: events are batched and sent with navigator.sendBeacon;
+// the running totals also go out with the exam submit in case a beacon is late
+function examBundle() {
+    const el = document.getElementById("examBundle");
+    if (!el) return null;
+    try {
+        return JSON.parse(el.textContent);
+    } catch (e) {
+        return null;
+    }
+}
+
+function recordEvent(type) {
+    telemetryQueue.push({ type: type, at: Date.now() });
+    telemetryTotals[type] = (telemetryTotals[type] || 0) + 1;
+    if (telemetryQueue.length >= 20) {
+        flushTelemetry();
+    } else if (!telemetryTimer) {
+        telemetryTimer = setTimeout(flushTelemetry, 5000);
+    }
+}
+
+function flushTelemetry() {
+    clearTimeout(telemetryTimer);
+    telemetryTimer = null;
+    const bundle = examBundle();
+    if (!telemetryQueue.length || !bundle) return;
+    const body = JSON.stringify({ token: bundle.token, events: telemetryQueue.splice(0, 100) });
+    if (navigator.sendBeacon && navigator.sendBeacon(bundle.telemetry_url, new Blob([body], { type: "application/json" }))) {
+        return;
+    }
+    if (window.fetch) {
+        fetch(bundle.telemetry_url, {
+            method: "POST", body: body, keepalive: true, credentials: "same-origin",
+            headers: { "Content-Type": "application/json" }
+        }).catch(function () {});
+    }
+}
+
 // Tab monitoring
 function initTabMonitor() {
     document.addEventListener("visibilitychange", function () {
         if (document.visibilityState === "hidden") {
             tabSwitchCount++;
+            recordEvent("tab_switch");
+            flushTelemetry();
             handleTabSwitch();
         }
     });
@@ -53,7 +97,12 @@ function autoSubmitExam(message) {
     alert(message);
     const form = document.getElementById("examForm");
     if (form) {
-        form.submit();
+        // requestSubmit runs the page's submit handler (offline-safe JSON submit); submit() would bypass it
+        if (form.requestSubmit) {
+            form.requestSubmit();
+        } else {
+            form.submit();
+        }
     }
 }
 
@@ -62,6 +111,7 @@ function disableCopyPaste() {
     // Disable right-click
     document.addEventListener('contextmenu', function(e) {
         e.preventDefault();
+        recordEvent("context_menu");
         return false;
     });
     
@@ -69,14 +119,17 @@ function disableCopyPaste() {
     document.addEventListener('keydown', function(e) {
         if (e.ctrlKey && e.keyCode === 67) {
             e.preventDefault();
+            recordEvent("copy");
             return false;
         }
         if (e.ctrlKey && e.keyCode === 86) {
             e.preventDefault();
+            recordEvent("paste");
             return false;
         }
         if (e.ctrlKey && e.keyCode === 88) {
             e.preventDefault();
+            recordEvent("cut");
             return false;
         }
         if (e.ctrlKey && e.keyCode === 65) {
@@ -87,16 +140,19 @@ function disableCopyPaste() {
     
     document.addEventListener('copy', function(e) {
         e.preventDefault();
+        recordEvent("copy");
         return false;
     });
     
     document.addEventListener('paste', function(e) {
         e.preventDefault();
+        recordEvent("paste");
         return false;
     });
     
     document.addEventListener('cut', function(e) {
         e.preventDefault();
+        recordEvent("cut");
         return false;
     });
 }
@@ -174,4 +230,6 @@ function showLoginForm() {
 // Initialize exam protections if on exam page
 if (document.getElementById('examForm')) {
     disableCopyPaste();
+    document.getElementById('examForm').addEventListener('submit', flushTelemetry);
+    window.addEventListener('pagehide', flushTelemetry);
 }